@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark do Auto-Push
+Mede o pipeline observar → commit → push contra um remoto bare local
+"""
+
+import os
+import sys
+import json
+import importlib.util
+import shutil
+import signal
+import argparse
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REAL_GIT = shutil.which('git')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+# ============================================================================
+# Utilitários
+# ============================================================================
+
+def git(repo: Path, *args, env: Optional[dict] = None) -> str:
+    """Executa o git real (fora da contagem de subprocessos) e retorna stdout"""
+    result = subprocess.run(
+        [REAL_GIT, *args], cwd=repo, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+def write_file(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+def process_cpu(pid: int) -> float:
+    """CPU (usuário+sistema) do processo e dos filhos já finalizados, em segundos"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return 0.0
+    # utime, stime, cutime, cstime (campos 14-17 do proc(5))
+    return sum(int(x) for x in fields[11:15]) / CLOCK_TICKS
+
+# ============================================================================
+# Repositório temporário
+# ============================================================================
+
+class BenchRepo:
+    """Repositório de trabalho com um `origin` bare local"""
+
+    def __init__(self, root: Path, seed_files: int = 100):
+        self.root = root
+        self.origin = root / 'origin.git'
+        self.work = root / 'work'
+        self.bin_dir = root / 'bin'
+        self.counter = root / 'git-calls'
+        self.ref = 'main'  # ref do remoto que deve receber as alterações
+
+        git(root, 'init', '-q', '--bare', '-b', 'main', str(self.origin))
+        git(root, 'init', '-q', '-b', 'main', str(self.work))
+        git(self.work, 'config', 'user.name', 'Auto-Push Bench')
+        git(self.work, 'config', 'user.email', 'bench@example.com')
+        git(self.work, 'remote', 'add', 'origin', str(self.origin))
+
+        (self.work / '.gitignore').write_text('.logs/\n')
+        (self.work / 'index.html').write_text('<h1>Academia Santiago</h1>\n')
+        for i in range(seed_files):
+            write_file(self.work / 'seed' / f'file-{i:04d}.txt', f'seed {i}\n'.encode())
+        git(self.work, 'add', '-A')
+        git(self.work, 'commit', '-q', '-m', 'seed')
+        git(self.work, 'push', '-q', '-u', 'origin', 'main')
+
+        # git "espião": conta cada processo git criado pelo auto-push
+        self.bin_dir.mkdir()
+        wrapper = self.bin_dir / 'git'
+        wrapper.write_text(
+            '#!/bin/sh\n'
+            f'echo "$1" >> "{self.counter}"\n'
+            f'exec "{REAL_GIT}" "$@"\n'
+        )
+        wrapper.chmod(0o755)
+
+    def git_calls(self) -> int:
+        try:
+            with open(self.counter) as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def expected_tree(self) -> str:
+        """Tree que o remoto deve ter depois do workload"""
+        # Objetos em um diretório à parte: gravá-los no repositório real
+        # adiantaria o trabalho do `git add` do auto-push
+        objects = git(self.work, 'rev-parse', '--git-path', 'objects')
+        (self.root / 'expected-objects').mkdir(exist_ok=True)
+        env = dict(os.environ, GIT_INDEX_FILE=str(self.root / 'expected-index'),
+                   GIT_OBJECT_DIRECTORY=str(self.root / 'expected-objects'),
+                   GIT_ALTERNATE_OBJECT_DIRECTORIES=str(self.work / objects))
+        git(self.work, 'read-tree', 'HEAD', env=env)
+        git(self.work, 'add', '-A', env=env)
+        return git(self.work, 'write-tree', env=env)
+
+    def remote_tree(self) -> Optional[str]:
+        try:
+            return git(self.origin, 'rev-parse', f'{self.ref}^{{tree}}')
+        except subprocess.CalledProcessError:
+            return None
+
+    def remote_commits(self) -> int:
+        try:
+            return int(git(self.origin, 'rev-list', '--count', self.ref))
+        except subprocess.CalledProcessError:
+            return 0
+
+# ============================================================================
+# Workloads
+# ============================================================================
+
+def workload_single_file(repo: BenchRepo, args):
+    with open(repo.work / 'index.html', 'a') as f:
+        f.write('<p>alteração</p>\n')
+
+def workload_burst(repo: BenchRepo, args):
+    for i in range(args.burst_files):
+        write_file(repo.work / 'burst' / f'{i // 100:02d}' / f'file-{i:05d}.txt',
+                   f'burst {i} {time.time()}\n'.encode())
+
+def workload_storm(repo: BenchRepo, args):
+    """Extração de um pacote grande (como unzip ou npm install)"""
+    for i in range(args.storm_files):
+        write_file(repo.work / 'vendor' / f'pkg-{i // 500:03d}' / f'mod-{i // 50 % 10}'
+                   / f'file-{i:05d}.js', f'module.exports = {i};\n'.encode())
+
+def workload_large_binary(repo: BenchRepo, args):
+    write_file(repo.work / 'assets' / 'large.bin', os.urandom(args.binary_size))
+
+def workload_delete(repo: BenchRepo, args):
+    for path in sorted((repo.work / 'seed').iterdir())[:args.delete_files]:
+        path.unlink()
+
+def workload_rename(repo: BenchRepo, args):
+    renamed = repo.work / 'renamed'
+    renamed.mkdir(exist_ok=True)
+    for path in sorted((repo.work / 'seed').iterdir())[:args.rename_files]:
+        path.rename(renamed / path.name)
+
+def workload_editor_noise(repo: BenchRepo, args):
+    """Salvamento do vim (sonda 4913, swap e backup~) e lock do emacs"""
+    work = repo.work
+    for i in range(args.editor_saves):
+        probe = work / '4913'
+        probe.write_bytes(b'')
+        probe.unlink()
+        swap = work / '.index.html.swp'
+        swap.write_bytes(os.urandom(4096))
+        (work / 'index.html').rename(work / 'index.html~')
+        (work / 'index.html').write_text(f'<h1>Academia Santiago</h1>\n<p>salvamento {i}</p>\n')
+        (work / 'index.html~').unlink()
+        swap.unlink()
+        lock = work / '.#index.html'
+        lock.symlink_to('bench@localhost.1234')
+        lock.unlink()
+
+def workload_slow_write(repo: BenchRepo, args):
+    """Arquivo grande gravado em blocos com pausas maiores que o quiet period"""
+    chunk = os.urandom(args.binary_size // args.write_chunks)
+    path = repo.work / 'assets' / 'slow.bin'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        for _ in range(args.write_chunks):
+            f.write(chunk)
+            f.flush()
+            time.sleep(args.chunk_pause)
+
+def workload_concurrent(repo: BenchRepo, args):
+    """Escritores contínuos enquanto os pushes acontecem"""
+    def writer(n: int):
+        deadline = time.monotonic() + args.concurrent_duration
+        i = 0
+        while time.monotonic() < deadline:
+            write_file(repo.work / 'concurrent' / f'writer-{n}' / f'file-{i % 20:02d}.txt',
+                       f'{n} {i} {time.time()}\n'.encode())
+            i += 1
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+SCENARIOS: Dict[str, Callable] = {
+    'single-file': workload_single_file,
+    'burst-1k': workload_burst,
+    'storm-20k': workload_storm,
+    'large-binary': workload_large_binary,
+    'delete': workload_delete,
+    'rename': workload_rename,
+    'editor-noise': workload_editor_noise,
+    'slow-write': workload_slow_write,
+    'concurrent': workload_concurrent,
+}
+
+# ============================================================================
+# Estresse do agregador (em processo)
+# ============================================================================
+
+def load_auto_push(script: Path):
+    """Importa o auto-push.py como módulo (o nome tem hífen)"""
+    spec = importlib.util.spec_from_file_location('auto_push', script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def stress_aggregator(args) -> dict:
+    """Escritores concorrentes contra trocas contínuas de lote.
+    
+    Cada evento usa um caminho único; ao final a união dos lotes retirados
+    tem de conter todos os caminhos, a soma dos eventos tem de bater e as
+    gerações dos lotes têm de ser contíguas (nenhum evento perdido).
+    """
+    module = load_auto_push(args.script)
+    aggregator = module.EventAggregator(module.Debouncer(0, 0, 0))
+    total = args.writers * args.stress_events
+    batches = []
+    writers_done = threading.Event()
+
+    def writer(n: int):
+        for i in range(args.stress_events):
+            aggregator.add(f'writer-{n}/file-{i}', created=(i % 7 == 0))
+            if i % 1000 == 0:
+                aggregator.request_rescan()
+
+    def consumer():
+        while True:
+            done = writers_done.is_set()
+            batch = aggregator.take(time.time())
+            if batch is not None:
+                batches.append(batch)
+            elif done:
+                return
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    reader = threading.Thread(target=consumer)
+    reader.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writers_done.set()
+    reader.join()
+    elapsed = time.monotonic() - started
+
+    seen = set()
+    duplicated = 0
+    for batch in batches:
+        duplicated += len(seen & batch.paths)
+        seen |= batch.paths
+    expected = {f'writer-{n}/file-{i}' for n in range(args.writers)
+                for i in range(args.stress_events)}
+    rescans = args.writers * len(range(0, args.stress_events, 1000))
+    events = sum(batch.event_count for batch in batches)
+    contiguous = all(a.end_generation == b.start_generation
+                     for a, b in zip(batches, batches[1:]))
+    lost = len(expected - seen)
+    return {
+        'scenario': 'stress-aggregator',
+        'ok': not lost and not duplicated and events == total + rescans and contiguous
+              and (not batches or batches[-1].end_generation == aggregator.generation),
+        'writers': args.writers,
+        'events': events,
+        'batches': len(batches),
+        'lost': lost,
+        'duplicated': duplicated,
+        'contiguous_generations': contiguous,
+        'duration_s': round(elapsed, 4),
+    }
+
+# ============================================================================
+# Latência do git com e sem core.fsmonitor
+# ============================================================================
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+def timed_git(repo: Path, config: List[str], *args) -> float:
+    started = time.perf_counter()
+    git(repo, *config, *args)
+    return time.perf_counter() - started
+
+def fsmonitor_latency(args) -> dict:
+    """Status e add -A em uma árvore sintética, sem e com o daemon de fsmonitor.
+    
+    Cada rodada altera alguns arquivos rastreados, mede `git status` e
+    `git add -A` e confere que exatamente esses arquivos foram para o
+    índice. A primeira rodada de cada modo (que grava as extensões do
+    índice) é descartada.
+    """
+    module = load_auto_push(args.script)
+    with tempfile.TemporaryDirectory(prefix='auto-push-bench-') as tmp:
+        repo = BenchRepo(Path(tmp), seed_files=0)
+        per_dir = 100
+        for i in range(args.fsmonitor_files):
+            write_file(repo.work / 'tree' / f'd{i // per_dir:04d}' / f'f{i % per_dir:03d}.txt',
+                       f'arquivo {i}\n'.encode())
+        git(repo.work, 'add', '-A')
+        git(repo.work, 'commit', '-q', '-m', 'árvore sintética')
+
+        git_dir = Path(git(repo.work, 'rev-parse', '--absolute-git-dir'))
+        modes = {
+            'without': ['-c', 'core.fsmonitor=false', '-c', 'core.untrackedCache=false'],
+            'with': ['-c', f'core.fsmonitor={module.fsmonitor_hook_command(git_dir)}',
+                     '-c', 'core.fsmonitorHookVersion=2', '-c', 'core.untrackedCache=true'],
+        }
+        log_path = repo.work / '.logs' / 'auto-push.log'
+        # Sem push durante a medição: o daemon só mantém o diário
+        child = subprocess.Popen(
+            [sys.executable, str(args.script), '--fsmonitor',
+             '--quiet-period', '3600', '--max-wait', '3600'],
+            cwd=repo.work, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        result = {'scenario': 'fsmonitor-100k', 'ok': False, 'files': args.fsmonitor_files}
+        try:
+            if not wait_for(lambda: log_path.exists()
+                            and 'core.fsmonitor' in log_path.read_text(errors='replace'),
+                            args.timeout):
+                result['error'] = 'auto-push não iniciou'
+                return result
+            staged_ok = True
+            counter = 0
+            for mode, config in modes.items():
+                status_times, add_times = [], []
+                for run in range(args.fsmonitor_rounds + 1):
+                    changed = []
+                    for _ in range(args.fsmonitor_changes):
+                        path = f'tree/d{counter % (args.fsmonitor_files // per_dir):04d}/f{counter % per_dir:03d}.txt'
+                        with open(repo.work / path, 'a') as f:
+                            f.write('alteração\n')
+                        changed.append(path)
+                        counter += 7
+                    # Deixa os eventos chegarem ao diário do daemon
+                    time.sleep(args.settle)
+                    status_s = timed_git(repo.work, config, 'status', '--porcelain')
+                    add_s = timed_git(repo.work, config, 'add', '-A')
+                    staged = set(git(repo.work, 'diff', '--cached', '--name-only').split('\n'))
+                    staged_ok &= staged == set(changed)
+                    git(repo.work, 'commit', '-q', '-m', f'rodada {mode} {run}')
+                    if run:
+                        status_times.append(status_s)
+                        add_times.append(add_s)
+                result[f'status_{mode}_fsmonitor_s'] = round(median(status_times), 4)
+                result[f'add_{mode}_fsmonitor_s'] = round(median(add_times), 4)
+            result['ok'] = staged_ok
+            result['status_speedup'] = round(
+                result['status_without_fsmonitor_s'] / result['status_with_fsmonitor_s'], 2)
+            result['add_speedup'] = round(
+                result['add_without_fsmonitor_s'] / result['add_with_fsmonitor_s'], 2)
+        finally:
+            child.send_signal(signal.SIGTERM)
+            child.wait()
+        return result
+
+def shadow_noop(args) -> dict:
+    """Modo shadow com um primeiro lote sem mudança em relação ao HEAD.
+    
+    Um arquivo criado e apagado gera um lote cuja árvore é a do HEAD: não
+    pode haver snapshot nem push (o ref local ainda não existe). Depois uma
+    alteração real tem de chegar a refs/autopush/main com um push só.
+    """
+    with tempfile.TemporaryDirectory(prefix='auto-push-bench-') as tmp:
+        repo = BenchRepo(Path(tmp), seed_files=0)
+        repo.ref = 'refs/autopush/main'
+        log_path = repo.work / '.logs' / 'auto-push.log'
+        child = subprocess.Popen(
+            [sys.executable, str(args.script), *args.child_args, '--publish-mode', 'shadow'],
+            cwd=repo.work, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        result = {'scenario': 'shadow-noop', 'ok': False}
+
+        def log() -> str:
+            return log_path.read_text(errors='replace') if log_path.exists() else ''
+
+        try:
+            if not wait_for(lambda: 'Iniciando monitoramento' in log(), args.timeout):
+                result['error'] = 'auto-push não iniciou'
+                return result
+            time.sleep(args.settle)
+
+            scratch = repo.work / 'scratch.txt'
+            scratch.write_text('temporário\n')
+            scratch.unlink()
+            if not wait_for(lambda: 'Snapshot idêntico' in log(), args.timeout):
+                result['error'] = 'lote sem mudança não foi processado'
+                return result
+            # Um push indevido falharia logo (ref local inexistente)
+            time.sleep(args.settle)
+            if 'Push falhou' in log() or repo.remote_tree() is not None:
+                result['error'] = 'push sem snapshot'
+                return result
+
+            workload_single_file(repo, args)
+            expected = repo.expected_tree()
+            result['ok'] = wait_for(lambda: repo.remote_tree() == expected,
+                                    args.timeout, args.poll_interval)
+            if not result['ok']:
+                result['error'] = 'remoto não alcançou o estado esperado'
+            result['push_failures'] = log().count('Push falhou')
+            result['ok'] = result['ok'] and not result['push_failures']
+        finally:
+            child.send_signal(signal.SIGTERM)
+            child.wait()
+        return result
+
+IN_PROCESS: Dict[str, Callable] = {
+    'stress-aggregator': stress_aggregator,
+    'fsmonitor-100k': fsmonitor_latency,
+    'shadow-noop': shadow_noop,
+}
+
+# ============================================================================
+# Execução
+# ============================================================================
+
+def wait_for(predicate: Callable[[], bool], timeout: float, interval: float = 0.01) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return False
+
+def run_scenario(name: str, args) -> dict:
+    """Executa um cenário em um repositório novo e retorna as métricas"""
+    with tempfile.TemporaryDirectory(prefix='auto-push-bench-') as tmp:
+        repo = BenchRepo(Path(tmp), seed_files=max(args.delete_files, args.rename_files))
+        repo.ref = args.remote_ref
+        log_path = repo.work / '.logs' / 'auto-push.log'
+        env = dict(os.environ, PATH=f"{repo.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+
+        started = time.monotonic()
+        child = subprocess.Popen(
+            [sys.executable, str(args.script), *args.child_args],
+            cwd=repo.work, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        result = {'scenario': name, 'ok': False}
+        try:
+            ready = wait_for(
+                lambda: log_path.exists() and 'Iniciando monitoramento' in log_path.read_text(errors='replace'),
+                args.timeout
+            )
+            if not ready:
+                result['error'] = 'auto-push não iniciou'
+                return result
+            result['startup_s'] = round(time.monotonic() - started, 4)
+
+            # Deixa os eventos da inicialização assentarem antes de medir
+            time.sleep(args.settle)
+            calls_before = repo.git_calls()
+            cpu_before = process_cpu(child.pid)
+            commits_before = repo.remote_commits()
+
+            SCENARIOS[name](repo, args)
+            written = time.monotonic()
+            expected = repo.expected_tree()
+
+            if wait_for(lambda: repo.remote_tree() == expected, args.timeout, args.poll_interval):
+                result['ok'] = True
+                result['latency_s'] = round(time.monotonic() - written, 4)
+            else:
+                result['error'] = 'remoto não alcançou o estado esperado'
+
+            result['cpu_s'] = round(process_cpu(child.pid) - cpu_before, 4)
+            result['subprocesses'] = repo.git_calls() - calls_before
+            result['commits'] = repo.remote_commits() - commits_before
+        finally:
+            child.send_signal(signal.SIGTERM)
+            try:
+                _, _, usage = os.wait4(child.pid, 0)
+                child.returncode = 0
+                # ru_maxrss é em KiB no Linux e em bytes no macOS
+                scale = 1 if sys.platform == 'darwin' else 1024
+                result['peak_rss_bytes'] = usage.ru_maxrss * scale
+            except ChildProcessError:
+                pass
+        return result
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Benchmark do pipeline observar → commit → push do auto-push.py',
+        # Opções do auto-push em --child-args não podem virar abreviações daqui
+        allow_abbrev=False
+    )
+    parser.add_argument('scenarios', nargs='*', metavar='cenário',
+                        help=f"cenários a executar: {', '.join([*SCENARIOS, *IN_PROCESS])} "
+                             "(padrão: todos)")
+    parser.add_argument('--script', type=Path, default=SCRIPT_DIR / 'auto-push.py',
+                        help='script auto-push a medir')
+    parser.add_argument('--output', '-o', type=Path,
+                        help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='execuções de cada cenário')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--settle', type=float, default=0.5,
+                        help='espera após a inicialização antes do workload')
+    parser.add_argument('--poll-interval', type=float, default=0.01,
+                        help='intervalo de consulta ao remoto')
+    parser.add_argument('--burst-files', type=int, default=1000)
+    parser.add_argument('--storm-files', type=int, default=20000,
+                        help='arquivos gerados no cenário storm-20k')
+    parser.add_argument('--binary-size', type=int, default=20 * 1024 * 1024)
+    parser.add_argument('--delete-files', type=int, default=100)
+    parser.add_argument('--rename-files', type=int, default=100)
+    parser.add_argument('--editor-saves', type=int, default=5,
+                        help='salvamentos simulados no cenário editor-noise')
+    parser.add_argument('--write-chunks', type=int, default=10,
+                        help='blocos do arquivo no cenário slow-write')
+    parser.add_argument('--chunk-pause', type=float, default=0.3,
+                        help='pausa entre blocos no cenário slow-write')
+    parser.add_argument('--writers', type=int, default=8,
+                        help='threads escritoras (concurrent e stress-aggregator)')
+    parser.add_argument('--concurrent-duration', type=float, default=8.0,
+                        help='segundos de escrita contínua no cenário concurrent')
+    parser.add_argument('--stress-events', type=int, default=20000,
+                        help='eventos por escritora no stress-aggregator')
+    parser.add_argument('--remote-ref', default='main',
+                        help='ref do origin conferido ao fim de cada cenário '
+                             '(ex.: refs/autopush/main com --publish-mode shadow)')
+    parser.add_argument('--fsmonitor-files', type=int, default=100000,
+                        help='arquivos rastreados no cenário fsmonitor-100k')
+    parser.add_argument('--fsmonitor-rounds', type=int, default=5,
+                        help='rodadas medidas por modo no fsmonitor-100k')
+    parser.add_argument('--fsmonitor-changes', type=int, default=10,
+                        help='arquivos alterados por rodada no fsmonitor-100k')
+    parser.add_argument('--child-args', nargs=argparse.REMAINDER,
+                        default=['--quiet-period', '0.2', '--min-interval', '0', '--max-wait', '5'],
+                        help='argumentos repassados ao auto-push (deve ser a última opção)')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    if REAL_GIT is None:
+        print("❌ Erro: git não encontrado no PATH")
+        sys.exit(1)
+
+    unknown = [name for name in args.scenarios
+               if name not in SCENARIOS and name not in IN_PROCESS]
+    if unknown:
+        print(f"❌ Erro: cenário desconhecido: {', '.join(unknown)}")
+        sys.exit(2)
+
+    results = []
+    for name in args.scenarios or [*SCENARIOS, *IN_PROCESS]:
+        for run in range(1, args.repeat + 1):
+            print(f"▶ {name} ({run}/{args.repeat})", file=sys.stderr)
+            if name in IN_PROCESS:
+                result = IN_PROCESS[name](args)
+            else:
+                result = run_scenario(name, args)
+            result['run'] = run
+            results.append(result)
+
+    report = {
+        'script': str(args.script),
+        'script_version': git(SCRIPT_DIR, 'rev-parse', '--short', 'HEAD')
+            if (SCRIPT_DIR / '.git').exists() else None,
+        'python': platform.python_version(),
+        'git': git(SCRIPT_DIR, '--version'),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'child_args': args.child_args,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(output + '\n')
+    else:
+        print(output)
+
+    if not all(r['ok'] for r in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
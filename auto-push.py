@@ -6,22 +6,62 @@ Monitora alterações no repositório e faz push automático para o GitHub
 """
 
 import os
+import re
+import json
+import copy
+import gzip
+import queue
+import atexit
+import bisect
+import shlex
+import shutil
+import socket
+import hashlib
 import sys
+import mmap
+import stat
+import ctypes
+import ctypes.util
+import select
+import struct
+import argparse
+import signal
 import subprocess
+import socketserver
+import tempfile
 import time
+import random
 import logging
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 try:
     from watchdog.observers import Observer
-    from watchdog.events import FileSystemEventHandler, FileModifiedEvent
+    from watchdog.events import (
+        FileSystemEventHandler, FileModifiedEvent, FileCreatedEvent, FileDeletedEvent,
+        FileMovedEvent, FileClosedEvent, DirCreatedEvent, DirDeletedEvent, DirMovedEvent
+    )
 except ImportError:
     print("❌ Erro: watchdog não está instalado")
     print("   Instale com: pip3 install watchdog")
     sys.exit(1)
 
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 # ============================================================================
 # Configuração de Logging
 # ============================================================================
@@ -48,162 +88,2451 @@ class ColoredFormatter(logging.Formatter):
         else:
             color = self.COLORS['DEBUG']
         
-        record.msg = f"{color}{record.msg}{self.COLORS['RESET']}"
+        # Cópia: o registro é compartilhado com os outros handlers (arquivo)
+        record = copy.copy(record)
+        record.msg = f"{color}{record.getMessage()}{self.COLORS['RESET']}"
+        record.args = None
         return super().format(record)
 
-# Configurar logging
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotaciona por tamanho e por tempo e comprime os arquivos rotacionados.
+    
+    O diretório e o arquivo só são criados na primeira gravação.
+    """
+    
+    def __init__(self, filename: Path, max_bytes: int, backup_count: int, interval: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval > 0 else None
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self.compress
+    
+    @staticmethod
+    def compress(source: str, dest: str):
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+    
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+    
+    def shouldRollover(self, record) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return bool(self.stream is not None or os.path.exists(self.baseFilename))
+        return bool(super().shouldRollover(record))
+    
+    def doRollover(self):
+        super().doRollover()
+        if self.rollover_at is not None:
+            self.rollover_at = time.time() + self.interval
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler com fila limitada: descarta (e conta) em vez de bloquear"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class PathDebugSampler(logging.Filter):
+    """Limita as linhas de depuração por caminho (`extra=PATH_EVENT`).
+    
+    Até `limit` linhas por janela de `window` segundos passam; as demais são
+    descartadas e resumidas em uma única linha quando a janela vira.
+    """
+    
+    def __init__(self, limit: int = 50, window: float = 1.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.suppressed = 0
+        self.lock = threading.Lock()
+    
+    def filter(self, record) -> bool:
+        if not getattr(record, 'per_path', False):
+            return True
+        
+        now = time.monotonic()
+        with self.lock:
+            suppressed = 0
+            if now - self.window_start >= self.window:
+                suppressed = self.suppressed
+                self.window_start = now
+                self.count = 0
+                self.suppressed = 0
+            self.count += 1
+            allowed = self.count <= self.limit
+            if not allowed:
+                self.suppressed += 1
+        
+        if suppressed:
+            logger.debug(f"... {suppressed} linha(s) de depuração por caminho omitida(s)")
+        return allowed
+
+# Marca uma linha de depuração por caminho (sujeita à amostragem)
+PATH_EVENT = {'per_path': True}
+
+# Configurar logging: os handlers só são instalados por setup_logging()
 log_dir = Path.cwd() / '.logs'
-log_dir.mkdir(exist_ok=True)
 log_file = log_dir / 'auto-push.log'
 
 logger = logging.getLogger('AutoPush')
 logger.setLevel(logging.DEBUG)
+log_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  interval: float = 86400.0) -> DroppingQueueHandler:
+    """Instala o pipeline assíncrono: fila -> thread -> arquivo rotativo e console.
+    
+    As threads do watcher e do agendador só enfileiram; a escrita em disco
+    (e a compressão dos arquivos rotacionados) roda na thread do listener.
+    """
+    global log_listener
+    
+    # Handler para arquivo
+    file_handler = CompressingRotatingFileHandler(log_file, max_bytes, backup_count, interval)
+    file_handler.setLevel(logging.DEBUG)
+    file_formatter = logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    file_handler.setFormatter(file_formatter)
+    
+    # Handler para console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_formatter = ColoredFormatter(
+        '%(asctime)s [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    console_handler.setFormatter(console_formatter)
+    
+    queue_handler = DroppingQueueHandler(queue.Queue(10000))
+    log_listener = logging.handlers.QueueListener(
+        queue_handler.queue, file_handler, console_handler, respect_handler_level=True
+    )
+    logger.addFilter(PathDebugSampler())
+    logger.addHandler(queue_handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    return queue_handler
 
-# Handler para arquivo
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.DEBUG)
-file_formatter = logging.Formatter(
-    '%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-file_handler.setFormatter(file_formatter)
+# ============================================================================
+# Log estruturado (JSON lines)
+# ============================================================================
 
-# Handler para console
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = ColoredFormatter(
-    '%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
-console_handler.setFormatter(console_formatter)
+class StructuredLog:
+    """Registro JSON por linha de cada etapa do pipeline (opcional).
+    
+    Um objeto por etapa (`batch`, `status`, `stage`, `commit`, `push`), com
+    durações, contagens, SHA e códigos de saída. A escrita é bufferizada e
+    uma thread descarrega o buffer a cada `flush_interval` segundos.
+    """
+    
+    def __init__(self):
+        self.file = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.flush_interval = 1.0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.file is not None
+    
+    def open(self, path: Path, flush_interval: float = 1.0):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8', buffering=64 * 1024)
+        self.flush_interval = flush_interval
+        threading.Thread(target=self.flush_loop, name='json-log', daemon=True).start()
+        atexit.register(self.close)
+    
+    def emit(self, stage: str, **fields):
+        """Grava um registro da etapa (no-op se o log não foi aberto)"""
+        if self.file is None:
+            return
+        record = {'ts': round(time.time(), 3), 'stage': stage, **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line + '\n')
+    
+    def flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            with self.lock:
+                if self.file is not None:
+                    self.file.flush()
+    
+    def close(self):
+        self.stop_event.set()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
 
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+pipeline_log = StructuredLog()
 
 # ============================================================================
-# Classe GitManager
+# Métricas
 # ============================================================================
 
-class GitManager:
-    """Gerenciador de operações Git"""
+class Metric:
+    """Base das métricas: valores por combinação de labels"""
     
-    def __init__(self, repo_path: str = '.'):
-        self.repo_path = Path(repo_path)
-        self.max_retries = 3
-        self.retry_delay = 10
+    kind = 'untyped'
     
-    def run_git_command(self, *args) -> Tuple[int, str, str]:
-        """Executa comando git e retorna (returncode, stdout, stderr)"""
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+    
+    def key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+    
+    def format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            f'{name}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for name, value in pairs
+        )
+        return '{' + ','.join(escaped) + '}'
+    
+    def header(self, openmetrics: bool) -> List[str]:
+        # No formato texto do Prometheus o TYPE de um counter usa o nome com _total
+        name = self.name + '_total' if self.kind == 'counter' and not openmetrics else self.name
+        return [f"# HELP {name} {self.help_text}", f"# TYPE {name} {self.kind}"]
+    
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Contador monotônico"""
+    
+    kind = 'counter'
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sem labels, o contador já aparece zerado (útil para alertas)
+        self.values: Dict[Tuple[str, ...], float] = {} if self.label_names else {(): 0}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+    
+    def samples(self) -> List[str]:
+        with self.lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}_total{self.format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(Metric):
+    """Valor instantâneo, lido de uma função no momento da coleta"""
+    
+    kind = 'gauge'
+    
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.function = None
+    
+    def set_function(self, function):
+        self.function = function
+    
+    def samples(self) -> List[str]:
+        if self.function is None:
+            return []
+        try:
+            return [f"{self.name} {self.function()}"]
+        except Exception:
+            return []
+
+
+class Histogram(Metric):
+    """Histograma com buckets cumulativos"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], List[float]] = {}  # contagens..., soma, total
+    
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            data = self.values.get(key)
+            if data is None:
+                data = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+    
+    def samples(self) -> List[str]:
+        with self.lock:
+            items = sorted((key, list(data)) for key, data in self.values.items())
+        lines = []
+        for key, data in items:
+            for bound, count in zip(self.buckets, data):
+                lines.append(f"{self.name}_bucket{self.format_labels(key, ('le', repr(float(bound))))} {count}")
+            lines.append(f"{self.name}_bucket{self.format_labels(key, ('le', '+Inf'))} {data[-1]}")
+            lines.append(f"{self.name}_sum{self.format_labels(key)} {data[-2]}")
+            lines.append(f"{self.name}_count{self.format_labels(key)} {data[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expostas pelo endpoint HTTP"""
+    
+    def __init__(self):
+        self.metrics: List[Metric] = []
+    
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+    
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self.register(Gauge(name, help_text))
+    
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), **kwargs) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, **kwargs))
+    
+    def render(self, openmetrics: bool = False) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.header(openmetrics))
+            lines.extend(metric.samples())
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+EVENTS_RECEIVED = metrics.counter(
+    'autopush_events_received', 'Eventos recebidos do watcher', ['type'])
+EVENTS_FILTERED = metrics.counter(
+    'autopush_events_filtered', 'Eventos descartados antes da lógica de push', ['reason'])
+GIT_CALLS = metrics.counter(
+    'autopush_git_calls', 'Chamadas ao Git por subcomando', ['subcommand', 'backend'])
+GIT_DURATION = metrics.histogram(
+    'autopush_git_duration_seconds', 'Duração das chamadas ao Git', ['subcommand', 'backend'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+COMMIT_FILES = metrics.histogram(
+    'autopush_commit_files', 'Arquivos alterados por commit',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 500, 1000, 5000))
+PUSH_ATTEMPTS = metrics.counter('autopush_push_attempts', 'Tentativas de push')
+PUSH_FAILURES = metrics.counter('autopush_push_failures', 'Pushes que falharam após todas as tentativas')
+PUSH_RETRIES = metrics.counter('autopush_push_retries', 'Novas tentativas de push após falha')
+PUSH_LATENCY = metrics.histogram(
+    'autopush_end_to_end_latency_seconds', 'Do primeiro evento da rajada até o push concluído',
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600))
+QUEUE_DEPTH = metrics.gauge('autopush_queue_depth', 'Jobs de push aguardando o worker')
+DIRTY_PATHS = metrics.gauge('autopush_dirty_paths', 'Caminhos alterados aguardando commit')
+CONTENT_CHECKS = metrics.counter(
+    'autopush_content_checks', 'Verificações de conteúdo por resultado', ['result'])
+LOG_DROPPED = metrics.gauge(
+    'autopush_log_records_dropped', 'Registros de log descartados com a fila de log cheia')
+EVENT_STORMS = metrics.counter('autopush_event_storms', 'Tempestades de eventos detectadas')
+STORM_EVENTS = metrics.counter(
+    'autopush_storm_events', 'Eventos agregados por subárvore durante tempestades')
+TRANSIENT_HITS = metrics.counter(
+    'autopush_transient_files', 'Eventos de arquivos transitórios descartados por padrão', ['pattern'])
+INDEX_CHECKS = metrics.counter(
+    'autopush_index_checks', 'Caminhos decididos pelo leitor do .git/index, por resultado', ['result'])
+SPECULATIVE_BLOBS = metrics.counter(
+    'autopush_speculative_blobs', 'Blobs gravados durante o debounce, por resultado', ['result'])
+FSMONITOR_QUERIES = metrics.counter(
+    'autopush_fsmonitor_queries', 'Consultas do hook core.fsmonitor respondidas')
+CONTENT_SUPPRESSION = metrics.gauge(
+    'autopush_content_suppression_ratio', 'Fração dos eventos descartados por conteúdo inalterado')
+
+def content_suppression_ratio() -> float:
+    unchanged = CONTENT_CHECKS.values.get(('unchanged',), 0)
+    total = unchanged + CONTENT_CHECKS.values.get(('changed',), 0)
+    return unchanged / total if total else 0.0
+
+CONTENT_SUPPRESSION.set_function(content_suppression_ratio)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serve GET /metrics no formato Prometheus/OpenMetrics"""
+    
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = metrics.render(openmetrics).encode('utf-8')
+        self.send_response(200)
+        if openmetrics:
+            self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        else:
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logger.debug(f"Métricas: {self.address_string()} {format % args}")
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """Inicia o endpoint de métricas em uma thread daemon"""
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='MetricsServer', daemon=True)
+    thread.start()
+    logger.info(f"✓ Métricas em http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+# ============================================================================
+# Snapshot do repositório
+# ============================================================================
+
+class StatusEntry:
+    """Uma entrada do `git status --porcelain=v2`"""
+    
+    def __init__(self, kind: str, xy: str, path: str, orig_path: Optional[str] = None):
+        self.kind = kind            # '1' alterado, '2' renomeado, 'u' conflito, '?' novo, '!' ignorado
+        self.xy = xy                # colunas index/worktree, '.' = sem alteração
+        self.path = path
+        self.orig_path = orig_path  # caminho de origem das renomeações
+    
+    def __repr__(self):
+        return f"StatusEntry({self.kind!r}, {self.xy!r}, {self.path!r})"
+
+
+class RepoSnapshot:
+    """Estado do repositório lido de uma única chamada de status.
+    
+    Reúne branch, upstream, ahead/behind e as entradas por arquivo, para
+    que todas as verificações de `should_push` usem o mesmo processo.
+    """
+    
+    def __init__(self, oid: Optional[str] = None, branch: Optional[str] = None,
+                 upstream: Optional[str] = None, ahead: int = 0, behind: int = 0,
+                 entries: Optional[List[StatusEntry]] = None):
+        self.oid = oid              # commit de HEAD (None em repositório vazio)
+        self.branch = branch        # 'HEAD' quando destacado
+        self.upstream = upstream
+        self.ahead = ahead
+        self.behind = behind
+        self.entries = entries or []
+    
+    @property
+    def has_changes(self) -> bool:
+        return any(entry.kind != '!' for entry in self.entries)
+    
+    @property
+    def has_unpushed_commits(self) -> bool:
+        return self.ahead > 0
+    
+    @classmethod
+    def parse(cls, output: str) -> 'RepoSnapshot':
+        """Lê a saída de `git status --porcelain=v2 --branch -z`"""
+        snapshot = cls()
+        records = output.split('\0')
+        i = 0
+        while i < len(records):
+            record = records[i]
+            i += 1
+            if not record:
+                continue
+            
+            if record.startswith('# '):
+                key, _, value = record[2:].partition(' ')
+                if key == 'branch.oid':
+                    snapshot.oid = None if value == '(initial)' else value
+                elif key == 'branch.head':
+                    snapshot.branch = 'HEAD' if value == '(detached)' else value
+                elif key == 'branch.upstream':
+                    snapshot.upstream = value
+                elif key == 'branch.ab':
+                    ahead, behind = value.split()
+                    snapshot.ahead, snapshot.behind = int(ahead), -int(behind)
+            elif record[0] == '1':
+                fields = record.split(' ', 8)
+                snapshot.entries.append(StatusEntry('1', fields[1], fields[8]))
+            elif record[0] == '2':
+                fields = record.split(' ', 9)
+                orig_path = records[i] if i < len(records) else None
+                i += 1
+                snapshot.entries.append(StatusEntry('2', fields[1], fields[9], orig_path))
+            elif record[0] == 'u':
+                fields = record.split(' ', 10)
+                snapshot.entries.append(StatusEntry('u', fields[1], fields[10]))
+            elif record[0] in '?!':
+                snapshot.entries.append(StatusEntry(record[0], record[0] * 2, record[2:]))
+        return snapshot
+
+# ============================================================================
+# Backends Git
+# ============================================================================
+
+class GitBackend:
+    """Interface dos backends usados pelo GitManager"""
+    
+    name = 'base'
+    
+    def __init__(self, repo_path: Path):
+        self.repo_path = repo_path
+        self.config_args: List[str] = []  # "-c chave=valor" de todas as chamadas git
+    
+    def run(self, *args, strip: bool = True, input: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+        """Executa comando git e retorna (returncode, stdout, stderr).
+        
+        `env` acrescenta variáveis ao ambiente (ex.: GIT_INDEX_FILE).
+        """
+        raise NotImplementedError
+    
+    def snapshot(self, paths: Optional[List[str]] = None) -> RepoSnapshot:
+        """Retorna branch, upstream, ahead/behind e entradas de status.
+        
+        Com `paths`, as entradas ficam restritas a esses caminhos (relativos
+        à raiz do repositório) em vez de varrer a árvore inteira.
+        """
+        raise NotImplementedError
+    
+    def current_branch(self) -> Optional[str]:
+        """Retorna a branch atual ou None se não for possível determinar"""
+        raise NotImplementedError
+    
+    def unpushed_count(self) -> int:
+        """Retorna quantos commits locais ainda não estão no upstream"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Libera recursos mantidos pelo backend"""
+
+
+class SubprocessBackend(GitBackend):
+    """Backend que executa um processo git por chamada (fallback)"""
+    
+    name = 'subprocess'
+    
+    def run(self, *args, strip: bool = True, input: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+        subcommand = next((arg for arg in args if not arg.startswith('-')), '')
+        started = time.perf_counter()
+        try:
+            return self.execute(args, strip, input, env)
+        finally:
+            GIT_CALLS.inc(subcommand=subcommand, backend='subprocess')
+            GIT_DURATION.observe(time.perf_counter() - started,
+                                 subcommand=subcommand, backend='subprocess')
+    
+    def execute(self, args, strip: bool = True, input: Optional[str] = None,
+                env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+        """Cria o processo git"""
         try:
             result = subprocess.run(
-                ['git', *args],
+                ['git', *self.config_args, *args],
                 cwd=self.repo_path,
+                env={**os.environ, **env} if env else None,
+                input=input,
                 capture_output=True,
                 text=True,
                 timeout=30
             )
-            return result.returncode, result.stdout.strip(), result.stderr.strip()
+            stdout = result.stdout.strip() if strip else result.stdout
+            return result.returncode, stdout, result.stderr.strip()
         except subprocess.TimeoutExpired:
             return 1, '', 'Comando expirou'
         except Exception as e:
             return 1, '', str(e)
     
+    def snapshot(self, paths: Optional[List[str]] = None) -> RepoSnapshot:
+        # Sem locks opcionais: não disputa o index.lock com o commit em andamento
+        args = ['--no-optional-locks', 'status', '--porcelain=v2', '--branch', '-z']
+        if paths is not None:
+            args += ['--', *(f':(literal){path}' for path in paths)]
+        code, output, _ = self.run(*args, strip=False)
+        return RepoSnapshot.parse(output) if code == 0 else RepoSnapshot()
+    
+    def current_branch(self) -> Optional[str]:
+        code, output, _ = self.run('rev-parse', '--abbrev-ref', 'HEAD')
+        return output if code == 0 else None
+    
+    def unpushed_count(self) -> int:
+        code, output, _ = self.run('rev-list', '--count', '@{u}..HEAD')
+        if code != 0 or not output.isdigit():
+            return 0
+        return int(output)
+
+
+class Pygit2Backend(SubprocessBackend):
+    """Backend em processo via libgit2: status e rev-list sem fork.
+    
+    Operações de escrita (add, commit, push) continuam usando o git da
+    linha de comando herdado do SubprocessBackend.
+    """
+    
+    name = 'pygit2'
+    
+    STATUS_CODES = (
+        ('GIT_STATUS_INDEX_NEW', 'A', 0),
+        ('GIT_STATUS_INDEX_MODIFIED', 'M', 0),
+        ('GIT_STATUS_INDEX_DELETED', 'D', 0),
+        ('GIT_STATUS_INDEX_RENAMED', 'R', 0),
+        ('GIT_STATUS_INDEX_TYPECHANGE', 'T', 0),
+        ('GIT_STATUS_WT_MODIFIED', 'M', 1),
+        ('GIT_STATUS_WT_DELETED', 'D', 1),
+        ('GIT_STATUS_WT_RENAMED', 'R', 1),
+        ('GIT_STATUS_WT_TYPECHANGE', 'T', 1),
+    )
+    
+    def __init__(self, repo_path: Path):
+        super().__init__(repo_path)
+        self.repo = pygit2.Repository(pygit2.discover_repository(str(repo_path)))
+        # Objetos do libgit2 não devem ser usados por várias threads ao mesmo tempo
+        self.lock = threading.Lock()
+    
+    def instrument(self, subcommand: str, started: float):
+        GIT_CALLS.inc(subcommand=subcommand, backend='pygit2')
+        GIT_DURATION.observe(time.perf_counter() - started, subcommand=subcommand, backend='pygit2')
+    
+    def snapshot(self, paths: Optional[List[str]] = None) -> RepoSnapshot:
+        started = time.perf_counter()
+        with self.lock:
+            snapshot = self.branch_info()
+            if paths is None:
+                flags_by_path = self.repo.status()
+            else:
+                flags_by_path = {}
+                prefixes = []
+                index_paths = None
+                for path in paths:
+                    try:
+                        flags_by_path[path] = self.repo.status_file(path)
+                        continue
+                    except (KeyError, ValueError):
+                        pass
+                    # status_file só aceita arquivos: diretórios (existentes ou
+                    # com arquivos rastreados) viram prefixo de um status completo
+                    if os.path.isdir(os.path.join(self.repo.workdir, path)):
+                        prefixes.append(path + '/')
+                        continue
+                    if index_paths is None:
+                        index_paths = sorted(entry.path for entry in self.repo.index)
+                    i = bisect.bisect_left(index_paths, path + '/')
+                    if i < len(index_paths) and index_paths[i].startswith(path + '/'):
+                        prefixes.append(path + '/')
+                    # senão: caminho inexistente e não rastreado
+                if prefixes:
+                    prefixes = tuple(prefixes)
+                    for path, flags in self.repo.status().items():
+                        if path.startswith(prefixes):
+                            flags_by_path[path] = flags
+        self.instrument('status', started)
+        
+        for path, flags in sorted(flags_by_path.items()):
+            entry = self.status_entry(path, flags)
+            if entry is not None:
+                snapshot.entries.append(entry)
+        return snapshot
+    
+    def branch_info(self) -> RepoSnapshot:
+        """Cabeçalho do snapshot: HEAD, branch, upstream e ahead/behind"""
+        repo = self.repo
+        if repo.head_is_unborn:
+            target = repo.references['HEAD'].target
+            return RepoSnapshot(branch=target.replace('refs/heads/', '', 1))
+        if repo.head_is_detached:
+            return RepoSnapshot(oid=str(repo.head.target), branch='HEAD')
+        
+        snapshot = RepoSnapshot(oid=str(repo.head.target), branch=repo.head.shorthand)
+        branch = repo.branches.local.get(snapshot.branch)
+        upstream = branch.upstream if branch is not None else None
+        if upstream is not None:
+            snapshot.upstream = upstream.shorthand
+            snapshot.ahead, snapshot.behind = repo.ahead_behind(branch.target, upstream.target)
+        return snapshot
+    
+    def status_entry(self, path: str, flags: int) -> Optional[StatusEntry]:
+        """Converte flags do libgit2 em uma entrada de status"""
+        if flags & pygit2.GIT_STATUS_IGNORED or flags == pygit2.GIT_STATUS_CURRENT:
+            return None
+        if flags & pygit2.GIT_STATUS_WT_NEW:
+            return StatusEntry('?', '??', path)
+        if flags & pygit2.GIT_STATUS_CONFLICTED:
+            return StatusEntry('u', 'UU', path)
+        
+        xy = ['.', '.']
+        for attr, code, column in self.STATUS_CODES:
+            if flags & getattr(pygit2, attr):
+                xy[column] = code
+        return StatusEntry('1', ''.join(xy), path)
+    
+    def current_branch(self) -> Optional[str]:
+        with self.lock:
+            if self.repo.head_is_unborn:
+                return None
+            if self.repo.head_is_detached:
+                return 'HEAD'
+            return self.repo.head.shorthand
+    
+    def unpushed_count(self) -> int:
+        started = time.perf_counter()
+        try:
+            with self.lock:
+                if self.repo.head_is_unborn or self.repo.head_is_detached:
+                    return 0
+                branch = self.repo.branches.local.get(self.repo.head.shorthand)
+                upstream = branch.upstream if branch is not None else None
+                if upstream is None:
+                    return 0
+                ahead, _ = self.repo.ahead_behind(branch.target, upstream.target)
+                return ahead
+        finally:
+            self.instrument('rev-list', started)
+
+
+BACKENDS = {
+    'subprocess': SubprocessBackend,
+    'pygit2': Pygit2Backend,
+}
+
+def create_backend(repo_path: Path, preference: str = 'auto') -> GitBackend:
+    """Cria o backend escolhido, caindo para subprocess quando indisponível"""
+    if preference not in ('auto', *BACKENDS):
+        logger.warning(f"Backend Git desconhecido '{preference}', usando 'auto'")
+        preference = 'auto'
+    
+    if preference in ('auto', 'pygit2'):
+        if pygit2 is None:
+            if preference == 'pygit2':
+                logger.warning("pygit2 não está instalado, usando backend subprocess")
+        else:
+            try:
+                return Pygit2Backend(repo_path)
+            except Exception as e:
+                logger.warning(f"Não foi possível iniciar backend pygit2 ({e}), usando subprocess")
+    
+    return SubprocessBackend(repo_path)
+
+# ============================================================================
+# Leitor do índice
+# ============================================================================
+
+class IndexReader:
+    """Leitura somente do .git/index (versões 2 a 4) via mmap.
+
+    Responde "este caminho mudou?" sem criar processo: compara os dados de
+    stat gravados no índice com o lstat do arquivo e, quando eles divergem
+    ou a entrada é "racily clean" (mtime não anterior ao do próprio
+    índice), calcula o OID do blob em processo. O mapa caminho → posição é
+    refeito sempre que o arquivo do índice muda.
+    """
+
+    ENTRY = struct.Struct('>10I')   # ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+    FLAG_EXTENDED = 0x4000
+    FLAG_STAGE = 0x3000
+    EXTENDED_UNSUPPORTED = 0x6000   # skip-worktree, intent-to-add
+
+    def __init__(self, repo_path: Path, git_dir: Path, object_format: str = 'sha1',
+                 index_file: Optional[Path] = None):
+        self.repo_path = repo_path
+        self.git_dir = git_dir
+        self.path = index_file or git_dir / 'index'
+        self.hash_name = 'sha256' if object_format == 'sha256' else 'sha1'
+        self.oid_size = 32 if object_format == 'sha256' else 20
+        self.lock = threading.Lock()
+        self.stat_key: Optional[Tuple[int, int, int]] = None
+        self.index_mtime_ns = 0
+        self.data: Optional[mmap.mmap] = None
+        self.offsets: Dict[str, int] = {}  # caminho → início da entrada (estágio 0)
+        self.names: Optional[List[str]] = None  # caminhos ordenados, montados sob demanda
+        self.version = 0
+        self.usable = False  # False com índice dividido/esparso ou em conflito
+        self.conflicted = False  # há entradas de estágio != 0 (merge não resolvido)
+        self.synced_key = None  # assinatura em que o índice batia com HEAD
+
+    def refresh(self) -> bool:
+        """Relê o índice se ele mudou; False se não há índice utilizável"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self.stat_key, self.usable = None, False
+            return False
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if key != self.stat_key:
+            self.stat_key = key
+            self.index_mtime_ns = st.st_mtime_ns
+            try:
+                self.load()
+            except (OSError, ValueError, struct.error) as e:
+                logger.debug(f"Índice ignorado: {e}")
+                self.usable = False
+        return self.usable
+
+    def load(self):
+        """Mapeia o arquivo e indexa as posições das entradas"""
+        self.usable = False
+        self.conflicted = False
+        self.offsets = {}
+        self.names = None
+        with open(self.path, 'rb') as f:
+            # O git troca o índice por rename: o mapa antigo continua válido
+            self.data = data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:4] != b'DIRC':
+            raise ValueError('assinatura inválida')
+        version, count = struct.unpack_from('>II', data, 4)
+        if version not in (2, 3, 4):
+            raise ValueError(f'versão {version} não suportada')
+        self.version = version
+
+        fixed = self.ENTRY.size + self.oid_size   # até as flags
+        offset = 12
+        previous = b''
+        offsets = self.offsets
+        for _ in range(count):
+            flags, = struct.unpack_from('>H', data, offset + fixed)
+            name_start = offset + fixed + 2
+            if flags & self.FLAG_EXTENDED:
+                if struct.unpack_from('>H', data, name_start)[0] & self.EXTENDED_UNSUPPORTED:
+                    return
+                name_start += 2
+            if version == 4:
+                # Prefixo compartilhado com o nome anterior (varint do git)
+                byte = data[name_start]
+                strip = byte & 0x7f
+                name_start += 1
+                while byte & 0x80:
+                    byte = data[name_start]
+                    strip = ((strip + 1) << 7) | (byte & 0x7f)
+                    name_start += 1
+                end = data.find(b'\0', name_start)
+                name = previous[:len(previous) - strip] + data[name_start:end]
+                next_offset = end + 1
+            else:
+                length = flags & 0xfff
+                end = name_start + length if length < 0xfff else data.find(b'\0', name_start)
+                name = data[name_start:end]
+                # Entrada alinhada em 8 bytes com 1 a 8 NULs
+                next_offset = offset + ((end - offset + 8) & ~7)
+            if flags & self.FLAG_STAGE:
+                self.conflicted = True
+                return  # conflito: o status do git decide
+            previous = name
+            offsets[name.decode('utf-8', 'surrogateescape')] = offset
+            offset = next_offset
+
+        # Índice dividido ("link") ou esparso ("sdir"): as entradas não bastam
+        end = len(data) - self.oid_size
+        while offset + 8 <= end:
+            signature = data[offset:offset + 4]
+            if signature in (b'link', b'sdir'):
+                return
+            offset += 8 + struct.unpack_from('>I', data, offset + 4)[0]
+        self.usable = True
+
+    def blob_oid(self, full_path: str, st: os.stat_result) -> Optional[bytes]:
+        """OID do blob do arquivo (ou do alvo do link), calculado em streaming"""
+        digest = hashlib.new(self.hash_name)
+        try:
+            if stat.S_ISLNK(st.st_mode):
+                target = os.fsencode(os.readlink(full_path))
+                digest.update(b'blob %d\0' % len(target))
+                digest.update(target)
+                return digest.digest()
+            with open(full_path, 'rb') as f:
+                digest.update(b'blob %d\0' % st.st_size)
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.digest()
+
+    def tracked(self, relative: str) -> bool:
+        """Arquivo ou diretório com entradas no índice (chamar depois de `refresh()`)"""
+        if relative in self.offsets:
+            return True
+        if self.names is None:
+            self.names = sorted(self.offsets)
+        prefix = relative + '/'
+        position = bisect.bisect_left(self.names, prefix)
+        return position < len(self.names) and self.names[position].startswith(prefix)
+
+    def path_state(self, relative: str) -> Optional[str]:
+        """'clean', 'modified', 'deleted', 'untracked' ou None (indeterminado).
+
+        Chamar depois de `refresh()`. Um caminho fora do índice que não
+        existe (criado e apagado) conta como 'clean'.
+        """
+        full_path = os.path.join(self.repo_path, relative)
+        try:
+            st = os.lstat(full_path)
+        except FileNotFoundError:
+            st = None
+        except OSError:
+            return None
+
+        offset = self.offsets.get(relative)
+        if offset is None:
+            if st is None:
+                return 'clean'
+            return 'untracked' if stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode) else None
+        if st is None:
+            return 'deleted'
+
+        (ctime_s, ctime_ns, mtime_s, mtime_ns, _, ino, mode, _, _,
+         size) = self.ENTRY.unpack_from(self.data, offset)
+        kind = mode & 0o170000
+        if kind == 0o160000:
+            return None  # submódulo
+        if kind != stat.S_IFMT(st.st_mode):
+            return 'modified'
+        if kind == stat.S_IFREG and bool(mode & 0o100) != bool(st.st_mode & 0o100):
+            return 'modified'
+        if size != st.st_size & 0xffffffff:
+            return 'modified'
+
+        entry_mtime = mtime_s * 10**9 + mtime_ns
+        if (entry_mtime == st.st_mtime_ns and ctime_s == st.st_ctime_ns // 10**9 & 0xffffffff
+                and ctime_ns == st.st_ctime_ns % 10**9 and ino == st.st_ino & 0xffffffff
+                and entry_mtime < self.index_mtime_ns):
+            return 'clean'
+        # Stat divergente ou entrada racy: decide pelo conteúdo
+        oid_start = offset + self.ENTRY.size
+        oid = self.blob_oid(full_path, st)
+        if oid is None:
+            return None
+        return 'clean' if oid == self.data[oid_start:oid_start + self.oid_size] else 'modified'
+
+    def states(self, paths: Iterable[str]) -> Optional[Dict[str, str]]:
+        """Estado de cada caminho, ou None se algum não pode ser decidido aqui"""
+        with self.lock:
+            if not self.refresh():
+                return None
+            result = {}
+            for path in paths:
+                state = self.path_state(path)
+                if state is None:
+                    return None
+                result[path] = state
+            return result
+
+    def signature(self) -> Optional[tuple]:
+        """Índice + HEAD + ref da branch: muda quando qualquer um deles muda"""
+        def stat_key(path: Path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            return st.st_mtime_ns, st.st_size, st.st_ino
+
+        try:
+            head = (self.git_dir / 'HEAD').read_text().strip()
+        except OSError:
+            return None
+        refs = []
+        if head.startswith('ref: '):
+            common = self.git_dir
+            try:
+                common = (self.git_dir / (self.git_dir / 'commondir').read_text().strip()).resolve()
+            except OSError:
+                pass
+            refs = [stat_key(common / head[5:]), stat_key(common / 'packed-refs')]
+        return (stat_key(self.path), head, *refs)
+
+    def mark_synced(self, key: Optional[tuple] = None):
+        """Registra que o índice bate com HEAD (após commit ou status sem stage).
+        
+        Já relê o índice aqui, na thread de quem chamou, e não no próximo lote.
+        """
+        self.synced_key = key if key is not None else self.signature()
+        with self.lock:
+            self.refresh()
+
+    @property
+    def synced(self) -> bool:
+        """O índice ainda é o que foi registrado como igual ao HEAD"""
+        return self.synced_key is not None and self.signature() == self.synced_key
+
+    def head_branch(self) -> Optional[str]:
+        """Branch de HEAD lida direto do .git/HEAD (None se destacado)"""
+        try:
+            head = (self.git_dir / 'HEAD').read_text().strip()
+        except OSError:
+            return None
+        return head[len('ref: refs/heads/'):] if head.startswith('ref: refs/heads/') else None
+
+# ============================================================================
+# Classe GitManager
+# ============================================================================
+
+SHADOW_REF_PREFIX = 'refs/autopush/'
+
+def shadow_ref(branch: str) -> str:
+    """Ref dos snapshots da branch no modo de publicação shadow"""
+    return SHADOW_REF_PREFIX + branch
+
+
+class GitManager:
+    """Gerenciador de operações Git"""
+    
+    def __init__(self, repo_path: str = '.', backend: Optional[str] = None):
+        self.repo_path = Path(repo_path)
+        self.max_retries = 3
+        self.retry_delay = 10
+        self.max_retry_delay = 120
+        self.max_pathspec = 1000  # acima disso o status completo é mais barato
+        self.remote_check_ttl = 3600  # segundos em que um ls-remote bem-sucedido vale
+        self.config: Optional[Dict[str, str]] = None
+        self.git_dir: Optional[Path] = None
+        self.index: Optional[IndexReader] = None  # leitor do .git/index, se ativado
+        self.commit_engine = 'porcelain'  # ou 'plumbing': índice privado + commit-tree
+        self.private_index_head: Optional[str] = None  # HEAD espelhado no índice privado
+        self.unsynced_paths: Optional[set] = set()  # commitados fora do índice real (None = tudo)
+        self.deferred_paths: Optional[set] = set()  # de commits adiados por merge/rebase (None = tudo)
+        self.tracked_paths: set = set()  # ls-files, sem o leitor do índice
+        self.tracked_key: Optional[Tuple[int, int, int]] = None  # stat do índice lido em tracked_paths
+        self.publish_mode = 'branch'  # ou 'shadow': snapshots em refs/autopush/<branch>
+        # (branch, valor do ref, pai, árvore do pai) espelhados no índice de snapshots
+        self.shadow_state: Optional[Tuple[str, str, str, str]] = None
+        self.shadow_pushed: Dict[str, str] = {}  # branch → último snapshot enviado
+        self.shadow_index: Optional[IndexReader] = None  # leitor do índice de snapshots
+        self.backend = create_backend(
+            self.repo_path,
+            backend or os.environ.get('AUTO_PUSH_GIT_BACKEND', 'auto')
+        )
+        logger.debug(f"Backend Git em uso: {self.backend.name}")
+    
+    def run_git_command(self, *args, **kwargs) -> Tuple[int, str, str]:
+        """Executa comando git e retorna (returncode, stdout, stderr)"""
+        return self.backend.run(*args, **kwargs)
+    
+    def load_config(self) -> Dict[str, str]:
+        """Lê de uma vez as chaves de configuração usadas pelo script"""
+        if self.config is None:
+            code, output, _ = self.run_git_command(
+                'config', '-z', '--get-regexp',
+                r'^(user\.(name|email)|core\.excludesfile|remote\.origin\.url|extensions\.objectformat)$',
+                strip=False
+            )
+            self.config = {}
+            # -z: "chave\nvalor\0" (chaves em minúsculas); código 1 = nenhuma chave.
+            # Saída vai de system a local: como no git, o último valor vence
+            for item in output.split('\0') if code == 0 else ():
+                if item:
+                    key, _, value = item.partition('\n')
+                    self.config[key] = value
+        return self.config
+    
     def check_config(self) -> bool:
         """Verifica se Git está configurado corretamente"""
         logger.info("Verificando configuração do Git...")
+        config = self.load_config()
         
         # Verificar user.name
-        code, _, _ = self.run_git_command('config', 'user.name')
-        if code != 0:
+        if not config.get('user.name'):
             logger.error("Git user.name não configurado")
             return False
         
         # Verificar user.email
-        code, _, _ = self.run_git_command('config', 'user.email')
-        if code != 0:
+        if not config.get('user.email'):
             logger.error("Git user.email não configurado")
             return False
         
         logger.info("✓ Git configurado corretamente")
         return True
     
-    def check_remote(self) -> bool:
-        """Verifica conexão com repositório remoto"""
+    def check_remote(self, branch: Optional[str] = None) -> bool:
+        """Verifica conexão com repositório remoto.
+        
+        O ls-remote lista só a branch atual, e um resultado positivo fica
+        em cache (por URL do remoto) por `remote_check_ttl` segundos.
+        """
         logger.info("Verificando conexão com repositório remoto...")
         
-        code, _, _ = self.run_git_command('ls-remote', 'origin')
+        url = self.load_config().get('remote.origin.url', '')
+        cache_file = self.get_git_dir() / 'auto-push-remote.json'
+        try:
+            cached = json.loads(cache_file.read_text())
+            if cached.get('url') == url and time.time() - cached.get('checked_at', 0) < self.remote_check_ttl:
+                logger.info("✓ Repositório remoto acessível (verificação em cache)")
+                return True
+        except (OSError, ValueError, AttributeError):
+            pass
+        
+        branch = branch or self.get_current_branch()
+        code, _, _ = self.run_git_command('ls-remote', 'origin', f'refs/heads/{branch}')
         if code != 0:
             logger.error("Não conseguiu conectar ao repositório remoto")
             return False
         
+        if self.remote_check_ttl > 0:
+            try:
+                cache_file.write_text(json.dumps({'url': url, 'checked_at': time.time()}))
+            except OSError:
+                pass
         logger.info("✓ Repositório remoto acessível")
         return True
     
-    def has_changes(self) -> bool:
+    def enable_fsmonitor(self, hook_command: str):
+        """Faz o status, add e commit do script consultarem o hook do daemon.
+        
+        Só vale para as chamadas deste processo: a configuração do
+        repositório não é alterada.
+        """
+        self.backend.config_args = [
+            '-c', f'core.fsmonitor={hook_command}',
+            '-c', 'core.fsmonitorHookVersion=2',
+            '-c', 'core.untrackedCache=true',
+        ]
+    
+    def snapshot(self, paths: Optional[Iterable[str]] = None) -> RepoSnapshot:
+        """Lê branch, upstream, ahead/behind e status em uma única chamada.
+        
+        Com `paths`, apenas esses caminhos são verificados; listas muito
+        grandes caem para o status completo.
+        """
+        if paths is not None:
+            paths = sorted(paths)
+            if len(paths) > self.max_pathspec:
+                paths = None
+        if paths is not None or self.index is None:
+            return self.backend.snapshot(paths)
+        
+        # Status completo sem nada no stage: o índice bate com HEAD
+        signature = self.index.signature()
+        snapshot = self.backend.snapshot()
+        staged = any(entry.kind in '12u' and entry.xy[0] != '.' for entry in snapshot.entries)
+        if not staged and signature == self.index.signature():
+            self.index.mark_synced(signature)
+        return snapshot
+    
+    def has_changes(self, paths: Optional[Iterable[str]] = None) -> bool:
         """Verifica se há alterações não commitadas"""
-        code, output, _ = self.run_git_command('status', '--porcelain')
-        return len(output) > 0
+        return self.snapshot(paths).has_changes
     
     def has_unpushed_commits(self) -> bool:
         """Verifica se há commits não enviados"""
-        branch = self.get_current_branch()
-        code, output, _ = self.run_git_command(
-            'rev-list', f'@{{u}}..HEAD'
-        )
-        return len(output) > 0
+        return self.backend.unpushed_count() > 0
+    
+    def get_git_dir(self) -> Path:
+        """Obtém o diretório .git real (também em worktrees e submódulos)"""
+        if self.git_dir is None:
+            code, output, _ = self.run_git_command('rev-parse', '--absolute-git-dir')
+            self.git_dir = Path(output) if code == 0 and output else self.repo_path / '.git'
+        return self.git_dir
+    
+    def get_global_excludes_file(self) -> Optional[Path]:
+        """Obtém o arquivo de exclusões globais (core.excludesFile)"""
+        excludes_file = self.load_config().get('core.excludesfile')
+        if excludes_file:
+            return Path(excludes_file).expanduser()
+        
+        config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(Path.home(), '.config')
+        return Path(config_home) / 'git' / 'ignore'
+    
+    def get_tracked_dirs(self) -> set:
+        """Obtém todos os diretórios que contêm arquivos rastreados"""
+        code, output, _ = self.run_git_command('ls-files', '-z')
+        dirs = set()
+        if code != 0:
+            return dirs
+        for path in output.split('\0'):
+            directory = os.path.dirname(path)
+            while directory and directory not in dirs:
+                dirs.add(directory)
+                directory = os.path.dirname(directory)
+        return dirs
+    
+    def is_tracked(self, relative: str) -> bool:
+        """Caminho no índice real (rastreado mesmo se casar com o .gitignore)"""
+        reader = self.index
+        if reader is not None:
+            with reader.lock:
+                if reader.refresh():
+                    return reader.tracked(relative)
+        try:
+            st = os.stat(self.get_git_dir() / 'index')
+            key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return False
+        if key != self.tracked_key:
+            code, output, _ = self.run_git_command('ls-files', '-z', strip=False)
+            self.tracked_paths = set(output.split('\0')) if code == 0 else set()
+            self.tracked_key = key
+        return relative in self.tracked_paths
     
     def get_current_branch(self) -> str:
         """Obtém a branch atual"""
-        code, output, _ = self.run_git_command(
-            'rev-parse', '--abbrev-ref', 'HEAD'
-        )
-        return output if code == 0 else 'main'
+        return self.backend.current_branch() or 'main'
     
     def get_status(self) -> str:
         """Obtém status do repositório"""
         code, output, _ = self.run_git_command('status', '--short')
         return output
     
-    def commit_and_push(self, message: str) -> bool:
+    def commit_and_push(self, message: str, stop_event: Optional[threading.Event] = None,
+                        branch: Optional[str] = None, paths: Optional[Iterable[str]] = None) -> bool:
         """Faz commit e push com retry"""
-        branch = self.get_current_branch()
+        branch = branch or self.get_current_branch()
         
-        logger.info(f"Fazendo commit na branch '{branch}'...")
+        if self.publish_mode == 'shadow':
+            ref = shadow_ref(branch)
+            if not self.commit_snapshot(message, branch, paths):
+                # Reenvia só um snapshot gravado cujo push falhou; sem ref
+                # local (árvore ainda igual ao HEAD) não há o que enviar
+                state = self.shadow_state
+                if (state is None or state[0] != branch or not state[1]
+                        or self.shadow_pushed.get(branch) == state[1]):
+                    return False
+            if not self.push(branch, stop_event, refspec=f'{ref}:{ref}'):
+                return False
+            self.shadow_pushed[branch] = self.shadow_state[1]
+            return True
+        
+        if not self.commit(message, branch, paths) and not self.has_unpushed_commits():
+            return False
         
-        # Stage todas as alterações
-        code, _, stderr = self.run_git_command('add', '-A')
+        return self.push(branch, stop_event)
+    
+    def stage(self, paths: Optional[Iterable[str]] = None,
+              env: Optional[Dict[str, str]] = None) -> bool:
+        """Faz stage das alterações.
+        
+        Com `paths`, só esses caminhos são adicionados (inclusive remoções),
+        passados via --pathspec-from-file separados por NUL; sem `paths`, ou
+        se o stage restrito falhar, cai para `git add -A` na árvore inteira.
+        `env` permite apontar outro índice (GIT_INDEX_FILE).
+        """
+        started = time.perf_counter()
+        if paths is not None:
+            paths = sorted(set(paths))
+            if not paths:
+                # Tudo já está no índice; pathspec vazio significaria a árvore inteira
+                return True
+            pathspec = ''.join(f':(literal){path}\0' for path in paths)
+            code, _, stderr = self.run_git_command(
+                'add', '-A', '--pathspec-from-file=-', '--pathspec-file-nul', input=pathspec, env=env
+            )
+            if code == 0:
+                logger.debug(f"Stage restrito a {len(paths)} caminho(s)")
+                pipeline_log.emit('stage', duration_s=round(time.perf_counter() - started, 4),
+                                  paths=len(paths), bytes=self.paths_size(paths),
+                                  exit_code=code, fallback=False)
+                return True
+            logger.warning(f"Stage restrito falhou ({stderr}), usando git add -A")
+        
+        code, _, stderr = self.run_git_command('add', '-A', env=env)
+        pipeline_log.emit('stage', duration_s=round(time.perf_counter() - started, 4),
+                          paths=None, bytes=None, exit_code=code, fallback=paths is not None)
         if code != 0:
             logger.error(f"Erro ao fazer stage: {stderr}")
             return False
+        return True
+    
+    def paths_size(self, paths: List[str]) -> Optional[int]:
+        """Bytes dos caminhos existentes (só calculado com o log estruturado)"""
+        if not pipeline_log.enabled:
+            return None
+        total = 0
+        for path in paths:
+            try:
+                total += os.lstat(self.repo_path / path).st_size
+            except OSError:
+                continue
+        return total
+    
+    def commit(self, message: str, branch: str, paths: Optional[Iterable[str]] = None) -> bool:
+        """Faz stage e commit; retorna False se não houve commit"""
+        logger.info(f"Fazendo commit na branch '{branch}'...")
+        if self.commit_engine == 'plumbing':
+            return self.commit_plumbing(message, paths)
+        
+        if not self.stage(paths):
+            return False
         
         # Commit
+        started = time.perf_counter()
         code, output, stderr = self.run_git_command('commit', '-m', message)
+        duration = round(time.perf_counter() - started, 4)
         if code != 0:
+            pipeline_log.emit('commit', duration_s=duration, exit_code=code, branch=branch,
+                              sha=None, files=0, engine='porcelain')
             if 'nothing to commit' in stderr or 'nothing to commit' in output:
                 logger.warning("Nenhuma alteração para fazer commit")
             else:
                 logger.error(f"Erro ao fazer commit: {stderr}")
             return False
         
-        logger.info(f"✓ Commit realizado: {message}")
+        files = None
+        match = re.search(r'(\d+) files? changed', output)
+        if match:
+            files = int(match.group(1))
+            COMMIT_FILES.observe(files)
+        if pipeline_log.enabled:
+            # "[main 1a2b3c4] mensagem" e "N files changed, X insertions(+), Y deletions(-)"
+            sha = re.search(r'^\[\S+ (?:\(root-commit\) )?([0-9a-f]+)\]', output, re.M)
+            insertions = re.search(r'(\d+) insertions?\(\+\)', output)
+            deletions = re.search(r'(\d+) deletions?\(-\)', output)
+            pipeline_log.emit(
+                'commit', duration_s=duration, exit_code=code, branch=branch,
+                sha=sha.group(1) if sha else None, files=files,
+                insertions=int(insertions.group(1)) if insertions else 0,
+                deletions=int(deletions.group(1)) if deletions else 0, engine='porcelain'
+            )
         
-        # Push com retry
-        for attempt in range(1, self.max_retries + 1):
-            logger.info(f"Fazendo push para origin/{branch} (tentativa {attempt}/{self.max_retries})...")
-            
-            code, output, stderr = self.run_git_command('push', 'origin', branch)
-            if code == 0:
-                logger.info("✓ Push realizado com sucesso!")
-                logger.info("✓ Deploy automático trigerrado no Render")
-                return True
-            else:
-                if attempt < self.max_retries:
-                    logger.warning(f"Push falhou. Aguardando {self.retry_delay}s antes de tentar novamente...")
-                    time.sleep(self.retry_delay)
+        if self.index is not None:
+            self.index.mark_synced()
+        logger.info(f"✓ Commit realizado: {message.splitlines()[0]}")
+        return True
+    
+    def private_index(self) -> Path:
+        return self.get_git_dir() / 'auto-push-index'
+    
+    def seed_index(self, index_file: Path, rev: str) -> bool:
+        """Faz um índice privado espelhar `rev` ('' = vazio).
+        
+        Parte de uma cópia do índice real: o `read-tree --reset` mantém o
+        stat das entradas iguais, e um `add -A` seguinte não precisa reler a
+        árvore inteira. Sem ela, `read-tree` puro.
+        """
+        env = {'GIT_INDEX_FILE': str(index_file)}
+        if not rev:
+            code, _, stderr = self.run_git_command('read-tree', '--empty', env=env)
+        else:
+            try:
+                shutil.copyfile(self.get_git_dir() / 'index', index_file)
+                code, _, stderr = self.run_git_command('read-tree', '--reset', rev, env=env)
+            except OSError as e:
+                code, stderr = 1, str(e)
+            if code != 0:
+                code, _, stderr = self.run_git_command('read-tree', rev, env=env)
+        if code != 0:
+            logger.error(f"Erro ao preparar o índice privado: {stderr}")
+            return False
+        return True
+    
+    def seed_private_index(self, head: str) -> bool:
+        """Faz o índice privado espelhar HEAD ('' = branch ainda sem commits)"""
+        ok = self.seed_index(self.private_index(), head)
+        self.private_index_head = head if ok else None
+        return ok
+    
+    def operation_in_progress(self) -> Optional[str]:
+        """Merge, rebase, cherry-pick ou revert em andamento (ou conflito no índice)"""
+        git_dir = self.get_git_dir()
+        for name, operation in (('MERGE_HEAD', 'merge'), ('CHERRY_PICK_HEAD', 'cherry-pick'),
+                                ('REVERT_HEAD', 'revert'), ('rebase-merge', 'rebase'),
+                                ('rebase-apply', 'rebase')):
+            if (git_dir / name).exists():
+                return operation
+        return 'conflito' if self.has_unmerged_entries() else None
+    
+    def has_unmerged_entries(self) -> bool:
+        """O índice real tem entradas de estágio != 0 (ex.: `git stash pop` com conflito)"""
+        reader = self.index
+        if reader is not None:
+            with reader.lock:
+                reader.refresh()
+                if reader.usable or reader.conflicted:
+                    return reader.conflicted
+        code, output, _ = self.run_git_command('ls-files', '-u', '-z')
+        return code == 0 and bool(output)
+    
+    def changed_files(self, old_tree: Optional[str], new_tree: str) -> Optional[int]:
+        """Arquivos que diferem entre duas árvores (sem `old_tree`, todos os de `new_tree`)"""
+        if old_tree:
+            code, output, _ = self.run_git_command(
+                'diff-tree', '-r', '--no-renames', '--name-only', '-z', old_tree, new_tree, strip=False)
+        else:
+            code, output, _ = self.run_git_command(
+                'ls-tree', '-r', '--name-only', '-z', new_tree, strip=False)
+        return output.count('\0') if code == 0 else None
+    
+    def commit_plumbing(self, message: str, paths: Optional[Iterable[str]] = None) -> bool:
+        """Commit sem tocar no índice do desenvolvedor.
+        
+        O stage vai para um GIT_INDEX_FILE privado que espelha HEAD; depois
+        write-tree, commit-tree e `update-ref HEAD <novo> <antigo>`. O
+        update-ref é um compare-and-swap: se o desenvolvedor fizer um commit
+        no meio do caminho ele falha, e o commit é refeito sobre o novo
+        HEAD. Hooks de commit não são executados. Durante um merge, rebase,
+        cherry-pick ou revert, ou com conflitos no índice, o commit é adiado
+        e os caminhos entram no próximo.
+        """
+        if paths is None or self.deferred_paths is None:
+            paths = None
+        else:
+            paths = sorted(self.deferred_paths.union(paths))
+        operation = self.operation_in_progress()
+        if operation:
+            logger.warning(f"{operation} em andamento: commit automático adiado")
+            self.deferred_paths = None if paths is None else set(paths)
+            return False
+        self.deferred_paths = set()
+        
+        env = {'GIT_INDEX_FILE': str(self.private_index())}
+        was_synced = self.index is not None and self.index.synced
+        
+        for attempt in range(1, 3):
+            started = time.perf_counter()
+            code, output, _ = self.run_git_command('rev-parse', 'HEAD', 'HEAD^{tree}')
+            # Falha = branch ainda sem commits
+            head, head_tree = output.split() if code == 0 else ('', None)
+            if head != self.private_index_head and not self.seed_private_index(head):
+                return False
+            if not self.stage(paths, env=env):
+                return False
+            
+            code, tree, stderr = self.run_git_command('write-tree', env=env)
+            if code != 0:
+                logger.error(f"Erro ao gravar a árvore: {stderr}")
+                return False
+            if tree == head_tree:
+                pipeline_log.emit('commit', duration_s=round(time.perf_counter() - started, 4),
+                                  exit_code=1, sha=None, files=0, engine='plumbing')
+                logger.warning("Nenhuma alteração para fazer commit")
+                return False
+            
+            code, commit, stderr = self.run_git_command(
+                'commit-tree', tree, *(('-p', head) if head else ()), '-m', message
+            )
+            if code != 0:
+                logger.error(f"Erro ao fazer commit: {stderr}")
+                return False
+            code, _, stderr = self.run_git_command(
+                'update-ref', '-m', f"auto-push: {message.splitlines()[0]}", 'HEAD', commit, head
+            )
+            duration = round(time.perf_counter() - started, 4)
+            files = self.changed_files(head_tree, tree) if code == 0 else None
+            pipeline_log.emit('commit', duration_s=duration, exit_code=code, sha=commit[:7],
+                              files=files, attempt=attempt, engine='plumbing')
+            if code == 0:
+                if files is not None:
+                    COMMIT_FILES.observe(files)
+                break
+            # HEAD mudou entre o rev-parse e o update-ref: refaz sobre o novo
+            logger.warning(f"HEAD mudou durante o commit ({stderr}), refazendo")
+            self.private_index_head = None
+        else:
+            logger.error("Não foi possível atualizar HEAD: alterado de novo durante o commit")
+            return False
+        
+        self.private_index_head = commit
+        self.sync_index(paths, was_synced)
+        logger.info(f"✓ Commit realizado: {message.splitlines()[0]}")
+        return True
+    
+    def commit_snapshot(self, message: str, branch: str,
+                        paths: Optional[Iterable[str]] = None) -> bool:
+        """Grava o estado da árvore de trabalho em refs/autopush/<branch>.
+        
+        Cada snapshot tem como pai o anterior (o primeiro, o HEAD) e nunca
+        toca HEAD, a branch ou o índice do desenvolvedor: o stage vai para um
+        índice privado que espelha o último snapshot. Árvore igual à do pai
+        não gera commit. Se o ref mudar por fora o update-ref
+        (compare-and-swap) falha e o índice é refeito a partir dele.
+        """
+        ref = shadow_ref(branch)
+        index_file = self.get_git_dir() / 'auto-push-shadow-index'
+        env = {'GIT_INDEX_FILE': str(index_file)}
+        paths = sorted(set(paths)) if paths is not None else None
+        
+        for attempt in range(1, 3):
+            started = time.perf_counter()
+            stage_paths = paths
+            state = self.shadow_state
+            if state is None or state[0] != branch:
+                code, output, _ = self.run_git_command(
+                    'for-each-ref', '--format=%(objectname) %(tree)', ref)
+                if code == 0 and output:
+                    parent, parent_tree = output.split()
+                    old = parent
+                else:
+                    # Primeiro snapshot da branch: parte de HEAD ('' sem commits)
+                    code, output, _ = self.run_git_command('rev-parse', 'HEAD', 'HEAD^{tree}')
+                    parent, parent_tree = output.split() if code == 0 else ('', '')
+                    old = ''
+                if not self.seed_index(index_file, parent):
+                    return False
+                state = self.shadow_state = (branch, old, parent, parent_tree)
+                # A árvore de trabalho pode ter qualquer diferença em relação à semente
+                stage_paths = None
+            _, old, parent, parent_tree = state
+            if stage_paths:
+                stage_paths = self.shadow_stage_paths(index_file, stage_paths)
+            
+            if not self.stage(stage_paths, env=env):
+                return False
+            code, tree, stderr = self.run_git_command('write-tree', env=env)
+            if code != 0:
+                logger.error(f"Erro ao gravar a árvore: {stderr}")
+                return False
+            if tree == parent_tree:
+                logger.info("Snapshot idêntico ao anterior, nada a gravar")
+                pipeline_log.emit('commit', duration_s=round(time.perf_counter() - started, 4),
+                                  exit_code=1, sha=None, files=0, engine='shadow', ref=ref)
+                return False
+            
+            code, commit, stderr = self.run_git_command(
+                'commit-tree', tree, *(('-p', parent) if parent else ()), '-m', message
+            )
+            if code != 0:
+                logger.error(f"Erro ao gravar o snapshot: {stderr}")
+                return False
+            code, _, stderr = self.run_git_command(
+                'update-ref', '-m', f"auto-push: {message.splitlines()[0]}", ref, commit, old
+            )
+            duration = round(time.perf_counter() - started, 4)
+            files = self.changed_files(parent_tree, tree) if code == 0 else None
+            pipeline_log.emit('commit', duration_s=duration, exit_code=code, sha=commit[:7],
+                              files=files, attempt=attempt, engine='shadow', ref=ref)
+            if code == 0:
+                if files is not None:
+                    COMMIT_FILES.observe(files)
+                self.shadow_state = (branch, commit, commit, tree)
+                logger.info(f"✓ Snapshot gravado em {ref}: {commit[:7]}")
+                return True
+            logger.warning(f"{ref} mudou durante o snapshot ({stderr}), refazendo")
+            self.shadow_state = None
+        
+        logger.error(f"Não foi possível atualizar {ref}: alterado de novo durante o snapshot")
+        return False
+    
+    def shadow_stage_paths(self, index_file: Path, paths: List[str]) -> List[str]:
+        """Descarta caminhos que não existem nem estão no índice de snapshots.
+        
+        Um arquivo criado e apagado no mesmo lote derrubaria o pathspec do
+        `git add` e o stage cairia no `add -A` da árvore inteira.
+        """
+        reader = self.shadow_index
+        if reader is None:
+            reader = self.shadow_index = IndexReader(
+                self.repo_path, self.get_git_dir(),
+                self.load_config().get('extensions.objectformat', 'sha1'), index_file
+            )
+        with reader.lock:
+            if not reader.refresh():
+                return paths
+            return [path for path in paths
+                    if os.path.lexists(self.repo_path / path) or reader.tracked(path)]
+    
+    def sync_index(self, paths: Optional[List[str]], was_synced: bool):
+        """Leva os caminhos commitados ao índice real (melhor esforço).
+        
+        Sem isso o `git status` do desenvolvedor mostraria esses arquivos
+        como revertidos no stage. Com o index.lock ocupado o índice real
+        fica como estava e os caminhos são tentados de novo no próximo commit.
+        """
+        if paths is None or self.unsynced_paths is None:
+            paths = None
+        else:
+            paths = sorted(self.unsynced_paths.union(paths))
+        if self.has_unmerged_entries():
+            # Um conflito surgiu depois do commit: o reset apagaria os estágios
+            logger.warning("Índice do repositório em conflito: sincronização adiada")
+            self.unsynced_paths = None if paths is None else set(paths)
+            return
+        if paths is None:
+            code, _, stderr = self.run_git_command('reset', '-q')
+        else:
+            code, _, stderr = self.run_git_command(
+                'reset', '-q', '--pathspec-from-file=-', '--pathspec-file-nul',
+                input=''.join(f':(literal){path}\0' for path in paths)
+            )
+        if code != 0:
+            logger.warning(f"Índice do repositório não sincronizado após o commit: {stderr}")
+            self.unsynced_paths = None if paths is None else set(paths)
+            return
+        self.unsynced_paths = set()
+        if was_synced:
+            self.index.mark_synced()
+    
+    def retry_backoff(self, attempt: int) -> float:
+        """Espera antes da próxima tentativa: exponencial com jitter"""
+        delay = min(self.retry_delay * 2 ** (attempt - 1), self.max_retry_delay)
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    def push(self, branch: str, stop_event: Optional[threading.Event] = None,
+             refspec: Optional[str] = None) -> bool:
+        """Faz push com retry; a espera é interrompida por `stop_event`"""
+        target = refspec.partition(':')[2] if refspec else branch
+        for attempt in range(1, self.max_retries + 1):
+            logger.info(f"Fazendo push para origin/{target} (tentativa {attempt}/{self.max_retries})...")
+            PUSH_ATTEMPTS.inc()
+            if attempt > 1:
+                PUSH_RETRIES.inc()
+            
+            started = time.perf_counter()
+            code, output, stderr = self.run_git_command('push', 'origin', refspec or branch)
+            pipeline_log.emit('push', attempt=attempt, duration_s=round(time.perf_counter() - started, 4),
+                              exit_code=code, branch=branch,
+                              error=stderr.splitlines()[-1] if code != 0 and stderr else None)
+            if code == 0:
+                logger.info("✓ Push realizado com sucesso!")
+                if refspec is None:
+                    logger.info("✓ Deploy automático trigerrado no Render")
+                return True
+            else:
+                if attempt < self.max_retries:
+                    delay = self.retry_backoff(attempt)
+                    logger.warning(f"Push falhou. Aguardando {delay:.1f}s antes de tentar novamente...")
+                    if stop_event is None:
+                        time.sleep(delay)
+                    elif stop_event.wait(delay):
+                        logger.warning("Encerrando: novas tentativas de push canceladas")
+                        return False
         
         logger.error(f"Falha ao fazer push após {self.max_retries} tentativas")
+        PUSH_FAILURES.inc()
         return False
 
+# ============================================================================
+# Filtro .gitignore
+# ============================================================================
+
+class IgnoreRule:
+    """Um padrão de .gitignore compilado para expressão regular"""
+    
+    def __init__(self, pattern: str, base: str):
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        elif pattern[:2] in ('\\!', '\\#'):
+            pattern = pattern[1:]
+        
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        
+        # Padrões sem barra (exceto no fim) valem em qualquer profundidade
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        if not anchored:
+            pattern = '**/' + pattern
+        
+        self.base = base
+        self.regex = re.compile(self.translate(pattern) + r'\Z', re.DOTALL)
+    
+    @staticmethod
+    def translate(pattern: str) -> str:
+        """Traduz um glob do Git (com `**`) para regex"""
+        out = []
+        i, n = 0, len(pattern)
+        while i < n:
+            if pattern.startswith('**/', i) and (i == 0 or pattern[i - 1] == '/'):
+                out.append('(?:.*/)?')
+                i += 3
+            elif pattern.startswith('**', i) and i + 2 == n and (i == 0 or pattern[i - 1] == '/'):
+                out.append('.*')
+                i += 2
+            elif pattern[i] == '*':
+                out.append('[^/]*')
+                i += 1
+            elif pattern[i] == '?':
+                out.append('[^/]')
+                i += 1
+            elif pattern[i] == '[':
+                end = pattern.find(']', i + 2)
+                if end == -1:
+                    out.append(re.escape('['))
+                    i += 1
+                    continue
+                body = pattern[i + 1:end]
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end + 1
+            elif pattern[i] == '\\' and i + 1 < n:
+                out.append(re.escape(pattern[i + 1]))
+                i += 2
+            else:
+                out.append(re.escape(pattern[i]))
+                i += 1
+        return ''.join(out)
+    
+    def matches(self, path: str, is_dir: bool) -> bool:
+        """Verifica o caminho (relativo à raiz do repositório)"""
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not path.startswith(self.base + '/'):
+                return False
+            path = path[len(self.base) + 1:]
+        return self.regex.match(path) is not None
+
+
+class IgnoreMatcher:
+    """Aplica .gitignore, .git/info/exclude e as exclusões globais.
+    
+    Os .gitignore de cada diretório são lidos sob demanda e mantidos em
+    cache; `invalidate()` descarta o cache quando um arquivo de exclusão
+    muda. Os arquivos fora da árvore de trabalho (info/exclude e global)
+    são conferidos por mtime, no máximo a cada `check_interval` segundos.
+    """
+    
+    def __init__(self, repo_path: Path, git_dir: Path,
+                 global_excludes: Optional[Path] = None, always_ignored: Iterable[str] = ()):
+        self.repo_path = repo_path
+        self.external_files = [f for f in (global_excludes, git_dir / 'info' / 'exclude') if f]
+        self.always_ignored = set(always_ignored)
+        self.check_interval = 2.0
+        self.lock = threading.Lock()
+        self.gitignore_rules: Dict[str, List[IgnoreRule]] = {}
+        self.dir_cache: Dict[str, bool] = {}
+        self.load_external()
+    
+    @staticmethod
+    def read_rules(path: Path, base: str) -> List[IgnoreRule]:
+        """Lê um arquivo de exclusão e compila suas regras"""
+        try:
+            lines = path.read_text(encoding='utf-8', errors='replace').splitlines()
+        except OSError:
+            return []
+        
+        rules = []
+        for line in lines:
+            if not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+            try:
+                rules.append(IgnoreRule(line, base))
+            except re.error:
+                logger.debug(f"Padrão de exclusão inválido em {path}: {line}")
+        return rules
+    
+    def external_signature(self) -> List[Optional[Tuple[int, int]]]:
+        """mtime e tamanho dos arquivos de exclusão externos"""
+        signature = []
+        for path in self.external_files:
+            try:
+                st = path.stat()
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return signature
+    
+    def load_external(self):
+        """(Re)carrega as regras globais e de .git/info/exclude"""
+        self.external_rules = []
+        for path in self.external_files:
+            self.external_rules.extend(self.read_rules(path, ''))
+        self.external_state = self.external_signature()
+        self.last_check = time.monotonic()
+        self.dir_cache.clear()
+    
+    def invalidate(self, ignore_file: str):
+        """Descarta o cache de um .gitignore alterado (caminho relativo)"""
+        with self.lock:
+            self.gitignore_rules.pop(os.path.dirname(ignore_file), None)
+            self.dir_cache.clear()
+        logger.debug(f"Regras de exclusão recarregadas: {ignore_file}")
+    
+    def invalidate_all(self):
+        """Descarta todos os .gitignore lidos (eventos podem ter sido perdidos)"""
+        with self.lock:
+            self.gitignore_rules.clear()
+            self.dir_cache.clear()
+    
+    def rules_for(self, directory: str) -> List[IgnoreRule]:
+        """Regras do .gitignore de um diretório (relativo; '' é a raiz)"""
+        rules = self.gitignore_rules.get(directory)
+        if rules is None:
+            rules = self.read_rules(self.repo_path / directory / '.gitignore', directory)
+            self.gitignore_rules[directory] = rules
+        return rules
+    
+    def match_single(self, path: str, is_dir: bool) -> bool:
+        """Aplica as regras ao caminho, sem olhar os diretórios pais"""
+        parts = path.split('/')
+        if any(part == '.git' for part in parts) or path in self.always_ignored:
+            return True
+        
+        # Ordem de precedência crescente: a última regra que casar vence
+        rule_sets = [self.external_rules]
+        for depth in range(len(parts)):
+            rule_sets.append(self.rules_for('/'.join(parts[:depth])))
+        
+        ignored = False
+        for rules in rule_sets:
+            for rule in rules:
+                if rule.matches(path, is_dir):
+                    ignored = not rule.negated
+        return ignored
+    
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Verifica se um caminho relativo à raiz é ignorado pelo Git"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_check >= self.check_interval:
+                self.last_check = now
+                if self.external_signature() != self.external_state:
+                    logger.debug("Exclusões globais/info/exclude alteradas, recarregando")
+                    self.load_external()
+            
+            # Nada dentro de um diretório ignorado pode ser reincluído
+            parts = path.split('/')
+            for depth in range(1, len(parts)):
+                directory = '/'.join(parts[:depth])
+                ignored = self.dir_cache.get(directory)
+                if ignored is None:
+                    ignored = self.match_single(directory, True)
+                    self.dir_cache[directory] = ignored
+                if ignored:
+                    return True
+            
+            return self.match_single(path, is_dir)
+
+# ============================================================================
+# Arquivos transitórios
+# ============================================================================
+
+# Padrões aplicados ao nome do arquivo (sem o diretório)
+DEFAULT_TRANSIENT_PATTERNS: Dict[str, str] = {
+    'vim-swap': r'^\..+\.sw[a-px]$|\.kate-swp$',
+    'vim-probe': r'^4913$',
+    'backup': r'~$',
+    'emacs-lock': r'^\.#',
+    'emacs-autosave': r'^#.*#$',
+    'jetbrains': r'___jb_(?:tmp|old|bak)___$',
+    'office-lock': r'^~\$|^\.~lock\..*#$',
+    'os-metadata': r'^(?:\.DS_Store|Thumbs\.db|desktop\.ini|\._.+)$',
+    'partial-download': r'\.(?:crdownload|part|download)$',
+    'temp': r'\.(?:tmp|temp)$',
+}
+
+class TransientClassifier:
+    """Reconhece arquivos transitórios de editores e do sistema pelo nome.
+    
+    Todos os padrões viram uma única regex compilada (uma alternativa
+    nomeada por padrão), consultada antes do .gitignore; cada acerto conta
+    em `autopush_transient_files_total` com o nome do padrão.
+    """
+    
+    def __init__(self, patterns: Optional[Dict[str, str]] = None):
+        if patterns is None:
+            patterns = DEFAULT_TRANSIENT_PATTERNS
+        self.names = list(patterns)
+        self.regex = None
+        if patterns:
+            self.regex = re.compile('|'.join(
+                f'(?P<p{i}>{pattern})' for i, pattern in enumerate(patterns.values())
+            ))
+    
+    def classify(self, relative: str) -> Optional[str]:
+        """Nome do padrão que reconhece o caminho, ou None"""
+        if self.regex is None:
+            return None
+        match = self.regex.search(relative.rpartition('/')[2])
+        if match is None:
+            return None
+        for i, name in enumerate(self.names):
+            if match.group(f'p{i}') is not None:
+                TRANSIENT_HITS.inc(pattern=name)
+                return name
+        return None
+
+def transient_pattern(value: str) -> Tuple[str, str]:
+    """Lê `nome=regex` (ou só a regex) de --transient-pattern"""
+    name, sep, pattern = value.partition('=')
+    if not sep or not re.fullmatch(r'[\w-]+', name):
+        name, pattern = value, value
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"regex inválida '{pattern}': {e}")
+    return name, pattern
+
+# ============================================================================
+# Impressão digital de conteúdo
+# ============================================================================
+
+class FingerprintCache:
+    """Detecta eventos que não mudaram o conteúdo do arquivo.
+    
+    Guarda (tamanho, mtime, hash) por caminho. Se tamanho e mtime não
+    mudaram o evento é descartado sem ler o arquivo; caso contrário o
+    conteúdo é hasheado (xxhash se instalado, senão blake2b) e comparado.
+    """
+    
+    def __init__(self, repo_path: Path, max_entries: int = 100000):
+        self.repo_path = repo_path
+        self.max_entries = max_entries
+        self.entries: Dict[str, Tuple[int, int, bytes]] = {}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def new_hasher():
+        if xxhash is not None:
+            return xxhash.xxh3_128()
+        return hashlib.blake2b(digest_size=16)
+    
+    def digest(self, path: Path) -> Optional[bytes]:
+        """Hash do conteúdo lido em blocos; None se não der para ler"""
+        hasher = self.new_hasher()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    hasher.update(chunk)
+        except OSError:
+            return None
+        return hasher.digest()
+    
+    def forget(self, relative: str):
+        """Descarta o que se sabe sobre um caminho (ex.: arquivo removido)"""
+        with self.lock:
+            self.entries.pop(relative, None)
+    
+    def clear(self):
+        """Esquece tudo: após eventos perdidos o cache pode estar velho"""
+        with self.lock:
+            self.entries.clear()
+    
+    def rename(self, src: str, dest: str):
+        """Acompanha uma renomeação: o conteúdo conhecido passa para o destino"""
+        with self.lock:
+            entry = self.entries.pop(src, None)
+            if entry is not None:
+                self.entries[dest] = entry
+    
+    def changed(self, relative: str) -> bool:
+        """Verifica se o conteúdo mudou desde o último evento do caminho"""
+        path = self.repo_path / relative
+        try:
+            st = path.stat()
+        except OSError:
+            self.forget(relative)
+            CONTENT_CHECKS.inc(result='changed')
+            return True
+        
+        with self.lock:
+            cached = self.entries.get(relative)
+        if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+            CONTENT_CHECKS.inc(result='unchanged')
+            return False
+        
+        digest = self.digest(path)
+        if digest is None:
+            CONTENT_CHECKS.inc(result='changed')
+            return True
+        
+        with self.lock:
+            if relative not in self.entries and len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[relative] = (st.st_size, st.st_mtime_ns, digest)
+        
+        if cached is not None and cached[2] == digest:
+            CONTENT_CHECKS.inc(result='unchanged')
+            return False
+        CONTENT_CHECKS.inc(result='changed')
+        return True
+
+# ============================================================================
+# Debounce
+# ============================================================================
+
+class Debouncer:
+    """Debounce de borda final com espera máxima.
+    
+    Uma rajada de eventos vira um único disparo: ele acontece quando a
+    rajada fica `quiet_period` segundos em silêncio, mas nunca depois de
+    `max_wait` segundos desde o primeiro evento, e nunca antes de
+    `min_interval` segundos desde o disparo anterior.
+    """
+    
+    def __init__(self, quiet_period: float = 2.0, max_wait: float = 30.0,
+                 min_interval: float = 10.0):
+        self.quiet_period = quiet_period
+        self.max_wait = max_wait
+        self.min_interval = min_interval
+        self.first_event_time = None
+        self.last_event_time = None
+        self.event_count = 0
+        self.last_fire_time = 0
+    
+    def record(self, now: float):
+        """Registra um evento da rajada atual"""
+        if self.first_event_time is None:
+            self.first_event_time = now
+        self.last_event_time = now
+        self.event_count += 1
+    
+    def deadline(self) -> Optional[float]:
+        """Momento do próximo disparo, ou None se não há rajada aberta"""
+        if self.first_event_time is None:
+            return None
+        deadline = min(
+            self.last_event_time + self.quiet_period,
+            self.first_event_time + self.max_wait
+        )
+        return max(deadline, self.last_fire_time + self.min_interval)
+    
+    def fire(self, now: float):
+        """Registra um disparo (conta para o `min_interval`)"""
+        self.last_fire_time = now
+    
+    def reset(self):
+        """Descarta a rajada atual sem contar como disparo"""
+        self.first_event_time = None
+        self.last_event_time = None
+        self.event_count = 0
+
+# ============================================================================
+# Agregador de eventos
+# ============================================================================
+
+class PendingWrite:
+    """Escrita de um arquivo que ainda pode estar em andamento"""
+    
+    def __init__(self, now: float, added: bool):
+        self.first_event = now
+        self.last_event = now
+        self.stat: Optional[Tuple[int, int]] = None  # (tamanho, mtime_ns) no último evento
+        self.opened = False  # modificado e ainda sem IN_CLOSE_WRITE
+        self.added = added  # o caminho entrou no lote por causa desta escrita
+
+
+class EventBatch:
+    """Eventos acumulados entre dois pushes"""
+    
+    def __init__(self, generation: int = 0):
+        self.paths = set()  # caminhos relativos tocados
+        self.created = set()  # arquivos criados neste lote
+        self.renames: Dict[str, str] = {}  # destino -> origem das renomeações
+        self.rescan = False  # eventos perdidos: o status deve ser completo
+        self.event_count = 0
+        self.write_events: Dict[str, int] = {}  # eventos de escrita por caminho (voltam com os retidos)
+        self.first_event_time: Optional[float] = None
+        self.start_generation = generation  # geração anterior ao primeiro evento
+        self.end_generation = generation  # geração do último evento
+    
+    @property
+    def pending(self) -> bool:
+        return bool(self.paths) or self.rescan
+
+
+class EventAggregator:
+    """Acumula os eventos do watcher e entrega lotes ao agendador.
+    
+    Todo o estado fica atrás de uma única condição. Cada evento incrementa
+    `generation`; `take()` troca o lote inteiro por um vazio de uma vez, de
+    modo que um evento que chega durante o status/commit cai no lote
+    seguinte em vez de ser apagado junto com o anterior.
+    
+    Também acompanha as escritas em andamento (`writes`): um arquivo só
+    entra no commit depois do fechamento da escrita ou, sem eventos de
+    fechamento, quando tamanho e mtime param de mudar.
+    
+    Durante uma tempestade de eventos (`storm_dirs` não é None) os eventos
+    só marcam subárvores; quando ela termina as subárvores entram no lote
+    e um único status as reconcilia.
+    """
+    
+    def __init__(self, debouncer: Optional[Debouncer] = None):
+        self.debouncer = debouncer or Debouncer()
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.batch = EventBatch()
+        self.writes: Dict[str, PendingWrite] = {}
+        self.write_timeout = 60.0  # espera máxima pelo fechamento de um arquivo aberto
+        self.storm_dirs: Optional[set] = None  # subárvores sujas da tempestade atual
+        self.storm_depth: Optional[int] = None  # profundidade após colapsar storm_dirs
+        self.storm_events = 0
+        self.max_storm_dirs = 256
+    
+    def record(self, now: float, notify: bool = True):
+        """Conta um evento no lote atual (chamar com a condição adquirida)"""
+        self.generation += 1
+        batch = self.batch
+        batch.event_count += 1
+        batch.end_generation = self.generation
+        if batch.first_event_time is None:
+            batch.first_event_time = now
+        self.debouncer.record(now)
+        if notify:
+            self.condition.notify()
+    
+    def storm_event(self, subtree: str, now: float):
+        """Registra um evento da tempestade só pela subárvore (memória limitada)"""
+        with self.condition:
+            dirs = self.storm_dirs
+            if dirs is None:
+                dirs = self.storm_dirs = set()
+                self.storm_depth = None
+                self.storm_events = 0
+                EVENT_STORMS.inc()
+                logger.info("Tempestade de eventos: agrupando por subárvore até ela terminar")
+                self.condition.notify()
+            self.storm_events += 1
+            if self.storm_depth is not None:
+                subtree = '/'.join(subtree.split('/')[:self.storm_depth])
+            if subtree not in dirs:
+                dirs.add(subtree)
+                if len(dirs) > self.max_storm_dirs:
+                    self.collapse_storm()
+            # Sem notify: o agendador só precisa acordar no fim da tempestade
+            self.record(now, notify=False)
+    
+    def collapse_storm(self):
+        """Troca as subárvores pelos diretórios de primeiro nível, ou pela raiz"""
+        if self.storm_depth is None:
+            self.storm_depth = 1
+            self.storm_dirs = {subtree.split('/')[0] for subtree in self.storm_dirs}
+            if len(self.storm_dirs) <= self.max_storm_dirs:
+                return
+        self.storm_depth = 0
+        self.storm_dirs = {''}  # raiz: status completo
+    
+    def end_storm(self, capped: bool = False):
+        """Encerra a tempestade: as subárvores sujas entram no lote atual.
+        
+        `capped`: a tempestade continua, mas `max_wait` venceu; se a taxa
+        seguir alta o handler abre outra em seguida.
+        """
+        with self.condition:
+            dirs = self.storm_dirs
+            if dirs is None:
+                return
+            self.storm_dirs = None
+            if '' in dirs:
+                self.batch.rescan = True
+            else:
+                self.batch.paths |= dirs
+            # Fechamentos da tempestade não foram vistos; o status decide
+            self.writes.clear()
+            STORM_EVENTS.inc(self.storm_events)
+            logger.info(("Tempestade ativa há max-wait" if capped else "Tempestade encerrada")
+                        + f": {self.storm_events} evento(s), "
+                        + ("reconciliação completa" if '' in dirs
+                           else f"{len(dirs)} subárvore(s) para reconciliar"))
+            self.condition.notify()
+    
+    def add(self, relative: str, created: bool = False, written: bool = False,
+            stat: Optional[Tuple[int, int]] = None, opened: bool = False):
+        """Registra um caminho alterado.
+        
+        `written` indica evento de conteúdo (o arquivo pode estar sendo
+        gravado); remoções e renomeações deixam o caminho completo.
+        """
+        now = time.time()
+        with self.condition:
+            if written:
+                pending = self.writes.get(relative)
+                if pending is None:
+                    pending = PendingWrite(now, opened and relative not in self.batch.paths)
+                    self.writes[relative] = pending
+                elif not opened:
+                    # Criação ou alteração conferida: o caminho fica no lote
+                    pending.added = False
+                pending.last_event = now
+                pending.stat = stat
+                pending.opened = pending.opened or opened
+                self.batch.write_events[relative] = self.batch.write_events.get(relative, 0) + 1
+            else:
+                self.writes.pop(relative, None)
+            self.batch.paths.add(relative)
+            if created:
+                self.batch.created.add(relative)
+            self.record(now)
+    
+    def finish_write(self, relative: str, changed: bool):
+        """Fechamento de escrita: o arquivo está completo"""
+        with self.condition:
+            pending = self.writes.pop(relative, None)
+            if changed:
+                self.batch.paths.add(relative)
+                self.record(time.time())
+            elif pending is not None and pending.added:
+                # Regravou o mesmo conteúdo: a escrita não alterou nada
+                self.batch.paths.discard(relative)
+    
+    def unstable(self, paths: Iterable[str], now: float, stat) -> set:
+        """Caminhos de `paths` cuja escrita ainda não terminou.
+        
+        Com eventos de fechamento, um arquivo modificado espera o fechamento
+        (até `write_timeout`); nos demais casos precisa ficar `quiet_period`
+        sem eventos e com o mesmo tamanho/mtime do último evento.
+        """
+        held = set()
+        with self.condition:
+            for relative in paths:
+                pending = self.writes.get(relative)
+                if pending is None:
+                    continue
+                if pending.opened:
+                    if now - pending.first_event < self.write_timeout:
+                        held.add(relative)
+                        continue
+                    logger.warning(f"Arquivo aberto há mais de {self.write_timeout:.0f}s: {relative}")
+                    pending.opened = False
+                current = stat(relative)
+                if current != pending.stat:
+                    # Mudou sem evento (ainda a caminho): recomeça a espera
+                    pending.stat = current
+                    pending.last_event = now
+                if now - pending.last_event < self.debouncer.quiet_period:
+                    held.add(relative)
+                    continue
+                del self.writes[relative]
+        return held
+    
+    def restore(self, batch: EventBatch, paths: Optional[set] = None):
+        """Devolve caminhos retirados ao lote atual (None = o lote inteiro)"""
+        now = time.time()
+        with self.condition:
+            current = self.batch
+            if paths is None:
+                paths = set(batch.paths)
+                current.rescan = current.rescan or batch.rescan
+                batch.rescan = False
+                moved = batch.event_count
+            else:
+                # Só os eventos de escrita dos caminhos devolvidos acompanham
+                moved = sum(batch.write_events.get(path, 0) for path in paths)
+            for path in paths & batch.write_events.keys():
+                current.write_events[path] = current.write_events.get(path, 0) + batch.write_events.pop(path)
+            current.event_count += moved
+            batch.event_count -= moved
+            current.paths |= paths
+            current.created |= batch.created & paths
+            for dest in paths & set(batch.renames):
+                current.renames.setdefault(dest, batch.renames.pop(dest))
+            batch.paths -= paths
+            batch.created -= paths
+            if current.first_event_time is None:
+                current.first_event_time = batch.first_event_time
+            self.debouncer.record(now)
+            self.condition.notify()
+    
+    def move(self, src: str, dest: str, src_ignored: bool, dest_ignored: bool) -> bool:
+        """Registra uma renomeação; retorna True se for um salvamento atômico"""
+        with self.condition:
+            self.writes.pop(src, None)
+            batch = self.batch
+            atomic_save = src_ignored or src in batch.created
+            batch.created.discard(src)
+            if atomic_save:
+                # O temporário do editor não existe mais nem chegou ao índice
+                batch.paths.discard(src)
+            if not atomic_save:
+                # Encadeia a→b→c como uma única renomeação a→c
+                origin = batch.renames.pop(src, src)
+                if not dest_ignored:
+                    batch.renames[dest] = origin
+            return atomic_save
+    
+    def request_rescan(self):
+        """Marca o lote atual para status completo"""
+        with self.condition:
+            self.batch.rescan = True
+            self.record(time.time())
+    
+    def storm_deadline(self) -> float:
+        """Fim presumido da tempestade: `quiet_period` sem eventos, até `max_wait`"""
+        debouncer = self.debouncer
+        deadline = debouncer.last_event_time + debouncer.quiet_period
+        if debouncer.first_event_time is not None:
+            # Taxa alta sustentada (dev server, build em watch): commita mesmo assim
+            deadline = min(deadline, debouncer.first_event_time + debouncer.max_wait)
+        return max(deadline, debouncer.last_fire_time + debouncer.min_interval)
+    
+    def deadline(self) -> Optional[float]:
+        """Momento do próximo push possível, ou None se não há nada pendente"""
+        with self.condition:
+            if self.storm_dirs is not None:
+                return self.storm_deadline()
+            if not self.batch.pending:
+                return None
+            return self.debouncer.deadline()
+    
+    def take(self, now: float) -> Optional[EventBatch]:
+        """Retira o lote atual se o prazo venceu (troca atômica)"""
+        with self.condition:
+            if self.storm_dirs is not None:
+                if now < self.storm_deadline():
+                    return None
+                debouncer = self.debouncer
+                self.end_storm(capped=now < debouncer.last_event_time + debouncer.quiet_period)
+            if not self.batch.pending or now < self.debouncer.deadline():
+                return None
+            batch = self.batch
+            self.batch = EventBatch(self.generation)
+            self.debouncer.reset()
+            return batch
+    
+    def fired(self, now: float):
+        """Registra que o lote retirado gerou um push"""
+        with self.condition:
+            self.debouncer.fire(now)
+    
+    def dirty_count(self) -> int:
+        with self.condition:
+            return len(self.batch.paths)
+
+# ============================================================================
+# Provedor core.fsmonitor
+# ============================================================================
+
+# Hook gerado no diretório .git: o git o executa a cada status/add, então
+# ele não importa nada além de socket/sys (e roda com python -S)
+FSMONITOR_HOOK = '''\
+# Gerado pelo auto-push.py: hook core.fsmonitor (protocolo 2) que consulta o
+# daemon em execução. Sem o daemon sai com erro e o git varre a árvore.
+import socket
+import sys
+
+if len(sys.argv) < 3 or sys.argv[2] != '2':
+    sys.exit(1)
+token = sys.argv[3] if len(sys.argv) > 3 else ''
+chunks = []
+try:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(5)
+    client.connect(sys.argv[1])
+    client.sendall(token.encode('utf-8', 'surrogateescape') + b'\\n')
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+except OSError:
+    sys.exit(1)
+if not chunks:
+    sys.exit(1)
+sys.stdout.buffer.write(b''.join(chunks))
+'''
+
+
+class FsmonitorJournal:
+    """Caminhos alterados desde cada token, no formato do fsmonitor do git.
+
+    Cada evento recebe um número de sequência; `paths` guarda a última
+    sequência de cada caminho em ordem crescente, então uma consulta só
+    percorre o que mudou depois do token. Tokens de outra execução, mais
+    antigos que `floor` ou pedidos durante uma tempestade recebem "/"
+    (o git examina a árvore inteira).
+    """
+
+    def __init__(self, max_paths: int = 100000):
+        self.lock = threading.Lock()
+        self.prefix = f'autopush:{os.getpid()}.{time.time_ns()}:'
+        self.seq = 0
+        self.floor = 0  # tokens até aqui não têm histórico
+        self.paths: Dict[str, int] = {}
+        self.max_paths = max_paths
+        self.suspended = False
+
+    def record(self, relative: str):
+        """Registra um caminho alterado (diretórios terminam em '/')"""
+        with self.lock:
+            self.seq += 1
+            self.paths.pop(relative, None)
+            self.paths[relative] = self.seq
+            if len(self.paths) > self.max_paths:
+                # Descarta a metade mais antiga; quem a pedir recebe "/"
+                for _ in range(len(self.paths) // 2):
+                    path = next(iter(self.paths))
+                    self.floor = self.paths.pop(path)
+
+    def invalidate(self):
+        """Esquece o histórico (eventos podem ter sido perdidos)"""
+        with self.lock:
+            self.seq += 1
+            self.floor = self.seq
+            self.paths.clear()
+
+    def suspend(self):
+        """Durante uma tempestade os eventos não são registrados um a um"""
+        with self.lock:
+            self.suspended = True
+
+    def resume(self):
+        self.invalidate()
+        with self.lock:
+            self.suspended = False
+
+    def query(self, token: str) -> bytes:
+        """Resposta do protocolo 2: novo token e caminhos, separados por NUL"""
+        with self.lock:
+            new_token = f'{self.prefix}{self.seq}'
+            since = -1
+            if token.startswith(self.prefix) and not self.suspended:
+                try:
+                    since = int(token[len(self.prefix):])
+                except ValueError:
+                    pass
+            if since < self.floor:
+                changed = ['/']
+            else:
+                changed = []
+                for path, seq in reversed(self.paths.items()):
+                    if seq <= since:
+                        break
+                    changed.append(path)
+        return b''.join(item.encode('utf-8', 'surrogateescape') + b'\0'
+                        for item in (new_token, *changed))
+
+
+class FsmonitorRequestHandler(socketserver.StreamRequestHandler):
+    """Responde a uma consulta do hook: uma linha com o token"""
+
+    def handle(self):
+        token = self.rfile.readline().decode('utf-8', 'surrogateescape').rstrip('\n')
+        self.wfile.write(self.server.journal.query(token))
+        FSMONITOR_QUERIES.inc()
+
+
+def fsmonitor_socket_path(git_dir: Path) -> Path:
+    """Socket do daemon; sai do .git se o caminho passar do limite do AF_UNIX"""
+    path = git_dir / 'auto-push-fsmonitor.sock'
+    if len(os.fsencode(path)) < 100:
+        return path
+    digest = hashlib.sha1(os.fsencode(git_dir)).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f'auto-push-{digest}.sock'
+
+def fsmonitor_hook_command(git_dir: Path) -> str:
+    """Valor de core.fsmonitor (o git acrescenta a versão e o token)"""
+    return ' '.join(shlex.quote(str(part)) for part in (
+        sys.executable, '-S', git_dir / 'auto-push-fsmonitor',
+        fsmonitor_socket_path(git_dir)
+    ))
+
+def start_fsmonitor_server(git_dir: Path, journal: FsmonitorJournal) -> socketserver.UnixStreamServer:
+    """Grava o hook no .git e atende as consultas em uma thread daemon"""
+    (git_dir / 'auto-push-fsmonitor').write_text(FSMONITOR_HOOK)
+    socket_path = fsmonitor_socket_path(git_dir)
+    try:
+        socket_path.unlink()
+    except FileNotFoundError:
+        pass
+    server = socketserver.ThreadingUnixStreamServer(str(socket_path), FsmonitorRequestHandler)
+    server.daemon_threads = True
+    server.journal = journal
+    thread = threading.Thread(target=server.serve_forever, name='FsmonitorServer', daemon=True)
+    thread.start()
+    logger.info(f"✓ Provedor core.fsmonitor em {socket_path}")
+    return server
+
 # ============================================================================
 # FileSystemEventHandler
 # ============================================================================
@@ -211,72 +2540,929 @@ class GitManager:
 class RepositoryChangeHandler(FileSystemEventHandler):
     """Handler para detectar alterações no repositório"""
     
-    def __init__(self, git_manager: GitManager):
+    def __init__(self, git_manager: GitManager, debouncer: Optional[Debouncer] = None,
+                 ignore_matcher: Optional[IgnoreMatcher] = None,
+                 push_worker: Optional['PushWorker'] = None,
+                 fingerprints: Optional[FingerprintCache] = None,
+                 transient: Optional[TransientClassifier] = None):
         self.git_manager = git_manager
-        self.last_push_time = 0
-        self.push_cooldown = 10  # segundos
-        self.pending_changes = False
+        self.push_worker = push_worker
+        self.fingerprints = fingerprints
+        self.transient = transient
+        self.fsmonitor: Optional[FsmonitorJournal] = None  # com --fsmonitor
+        self.blob_writer: Optional['BlobWriter'] = None  # blobs gravados durante o debounce
+        self.aggregator = EventAggregator(debouncer)
+        self.ignore_matcher = ignore_matcher
+        self.reconcile_interval = 300  # segundos entre status completos
+        # 0: o primeiro lote faz status completo e leva alterações anteriores à partida
+        self.last_reconcile_time = 0.0
+        self.snapshot: Optional[RepoSnapshot] = None  # último status lido por should_push
+        self.stage_paths: Optional[set] = None  # caminhos do próximo stage (None = tudo)
+        self.close_events = False  # o observer entrega IN_CLOSE_WRITE (on_closed)
+        self.storm_threshold = 1000  # eventos/s que iniciam uma tempestade (0 = nunca)
+        self.storming = False
+        self.rate_window_start = time.monotonic()
+        self.rate_count = 0
+        # Acorda o PushScheduler a cada evento
+        self.condition = self.aggregator.condition
+    
+    def relative_path(self, path: str) -> str:
+        """Converte o caminho do evento para relativo à raiz, com '/'"""
+        relative = os.path.relpath(path, self.git_manager.repo_path)
+        return relative.replace(os.sep, '/')
+    
+    def dispatch(self, event):
+        """Entrega o evento, ou só marca a subárvore durante uma tempestade.
+        
+        Acima de `storm_threshold` eventos por segundo (`git checkout`,
+        `npm install`, unzip) os eventos deixam de passar pelos filtros e
+        pelo log; a tempestade termina quando a taxa cai abaixo do limite,
+        depois de `quiet_period` sem eventos ou, se persistir, a cada `max_wait`.
+        """
+        now = time.monotonic()
+        if now - self.rate_window_start >= 1.0:
+            if self.storming and self.rate_count < self.storm_threshold:
+                self.end_storm()
+                self.aggregator.end_storm()
+            self.rate_window_start = now
+            self.rate_count = 0
+        self.rate_count += 1
+        
+        if self.storming and self.aggregator.storm_dirs is None:
+            # Encerrada pelo agendador após o silêncio
+            self.end_storm()
+            self.rate_count = 1
+        elif not self.storming and self.storm_threshold and self.rate_count > self.storm_threshold:
+            self.storming = True
+            if self.fsmonitor is not None:
+                self.fsmonitor.suspend()
+        
+        if self.storming:
+            self.storm_event(event)
+            return
+        if self.fsmonitor is not None:
+            self.journal_event(event)
+        super().dispatch(event)
+    
+    def end_storm(self):
+        self.storming = False
+        if self.fsmonitor is not None:
+            self.fsmonitor.resume()
+        # A tempestade não passou pelo cache: um conteúdo anterior a ela
+        # voltaria a ser tomado como "sem mudança"
+        if self.fingerprints is not None:
+            self.fingerprints.clear()
+    
+    def journal_event(self, event):
+        """Registra o evento para o hook core.fsmonitor, antes de qualquer filtro"""
+        suffix = '/' if event.is_directory else ''
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if not path:
+                continue
+            relative = self.relative_path(path)
+            if relative == '.git' or relative.startswith('.git/') or relative.startswith('..'):
+                continue
+            self.fsmonitor.record(relative + suffix)
+    
+    def storm_event(self, event):
+        """Marca a subárvore do evento (diretório pai; o próprio caminho na raiz)"""
+        now = time.time()
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if not path:
+                continue
+            relative = self.relative_path(path)
+            if relative == '.git' or relative.startswith('.git/') or relative.startswith('..'):
+                continue
+            parent, _, name = relative.rpartition('/')
+            # Um checkout costuma trocar .gitignore: as regras não podem ficar velhas
+            if name == '.gitignore' and self.ignore_matcher is not None:
+                self.ignore_matcher.invalidate(relative)
+            self.aggregator.storm_event(parent or relative, now)
+    
+    def on_any_event(self, event):
+        """Chamado para todo evento, antes do método específico"""
+        EVENTS_RECEIVED.inc(type=event.event_type)
+    
+    def should_ignore(self, event) -> bool:
+        """Descarta diretórios, arquivos internos e caminhos ignorados pelo Git"""
+        if event.is_directory:
+            EVENTS_FILTERED.inc(reason='directory')
+            return True
+        
+        relative = self.relative_path(event.src_path)
+        if self.is_transient(relative):
+            EVENTS_FILTERED.inc(reason='transient')
+            return True
+        
+        if self.is_ignored_path(relative):
+            EVENTS_FILTERED.inc(reason='ignored')
+            return True
+        return False
+    
+    def is_transient(self, relative: str) -> bool:
+        """Swap de editor, backup, lock ou metadado do sistema"""
+        return self.transient is not None and self.transient.classify(relative) is not None
+    
+    def is_ignored_path(self, relative: str) -> bool:
+        """Verifica um caminho relativo contra .git, logs e o .gitignore"""
+        if self.ignore_matcher is None:
+            return any(part in ('.git', '.logs') for part in relative.split('/'))
+        
+        if os.path.basename(relative) == '.gitignore':
+            self.ignore_matcher.invalidate(relative)
+        if not self.ignore_matcher.is_ignored(relative):
+            return False
+        # Arquivo adicionado com -f (ou antes do padrão existir) continua rastreado
+        return not self.git_manager.is_tracked(relative)
+    
+    def content_unchanged(self, event) -> bool:
+        """Descarta eventos que não alteraram o conteúdo (antes de qualquer git)"""
+        if self.fingerprints is None:
+            return False
+        if self.fingerprints.changed(self.relative_path(event.src_path)):
+            return False
+        EVENTS_FILTERED.inc(reason='unchanged')
+        return True
+    
+    def file_stat(self, relative: str) -> Optional[Tuple[int, int]]:
+        """(tamanho, mtime_ns) do caminho, ou None se não existe"""
+        try:
+            st = os.lstat(os.path.join(self.git_manager.repo_path, relative))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+    
+    def mark_dirty(self, path: str, created: bool = False, written: bool = False,
+                   opened: bool = False):
+        """Registra um caminho alterado no lote atual"""
+        relative = self.relative_path(path)
+        stat = self.file_stat(relative) if written else None
+        self.aggregator.add(relative, created, written, stat, opened)
+    
+    def prewrite(self, path: str, closed: bool = False):
+        """Agenda a gravação antecipada do blob do arquivo"""
+        if self.blob_writer is not None:
+            self.blob_writer.submit(self.relative_path(path), closed)
+    
+    def request_rescan(self, reason: str):
+        """Força um status completo no próximo push (eventos podem ter sido perdidos)"""
+        logger.debug(f"Reconciliação solicitada: {reason}")
+        if self.fsmonitor is not None:
+            self.fsmonitor.invalidate()
+        if self.ignore_matcher is not None:
+            self.ignore_matcher.invalidate_all()
+        if self.fingerprints is not None:
+            self.fingerprints.clear()
+        self.aggregator.request_rescan()
+    
+    def next_deadline(self) -> Optional[float]:
+        """Momento do próximo push possível, ou None se não há nada pendente"""
+        return self.aggregator.deadline()
     
     def on_modified(self, event):
         """Chamado quando um arquivo é modificado"""
-        if event.is_directory:
+        # Ignorar diretórios, arquivos do Git, logs e caminhos do .gitignore
+        if self.should_ignore(event):
             return
         
-        # Ignorar arquivos do Git e logs
-        if any(x in event.src_path for x in ['.git', '.logs', '.auto-push.log']):
+        if self.close_events:
+            # Escrita em andamento: o conteúdo é conferido no fechamento
+            self.mark_dirty(event.src_path, written=True, opened=True)
             return
         
-        self.pending_changes = True
-        logger.debug(f"Alteração detectada: {event.src_path}")
+        if self.content_unchanged(event):
+            return
+        self.mark_dirty(event.src_path, written=True)
+        self.prewrite(event.src_path)
+        logger.debug(f"Alteração detectada: {event.src_path}", extra=PATH_EVENT)
     
-    def on_created(self, event):
-        """Chamado quando um arquivo é criado"""
-        if event.is_directory:
+    def on_closed(self, event):
+        """Chamado quando um arquivo aberto para escrita é fechado"""
+        if self.should_ignore(event):
             return
         
-        if any(x in event.src_path for x in ['.git', '.logs', '.auto-push.log']):
+        changed = not self.content_unchanged(event)
+        self.aggregator.finish_write(self.relative_path(event.src_path), changed)
+        if changed:
+            self.prewrite(event.src_path, closed=True)
+            logger.debug(f"Escrita concluída: {event.src_path}", extra=PATH_EVENT)
+    
+    def on_created(self, event):
+        """Chamado quando um arquivo é criado"""
+        if self.should_ignore(event) or self.content_unchanged(event):
             return
         
-        self.pending_changes = True
-        logger.debug(f"Arquivo criado: {event.src_path}")
+        self.mark_dirty(event.src_path, created=True, written=True)
+        if not self.close_events:
+            self.prewrite(event.src_path)
+        logger.debug(f"Arquivo criado: {event.src_path}", extra=PATH_EVENT)
     
     def on_deleted(self, event):
         """Chamado quando um arquivo é deletado"""
+        if self.should_ignore(event):
+            return
+        
+        if self.fingerprints is not None:
+            self.fingerprints.forget(self.relative_path(event.src_path))
+        
+        self.mark_dirty(event.src_path)
+        logger.debug(f"Arquivo deletado: {event.src_path}", extra=PATH_EVENT)
+    
+    def on_moved(self, event):
+        """Chamado quando um arquivo é renomeado.
+        
+        Uma renomeação vira o par (origem, destino) e os dois caminhos vão
+        para o stage. Se a origem é um temporário criado nesta rajada (ou
+        ignorado), é o salvamento atômico dos editores (grava temporário,
+        renomeia por cima): conta só como modificação do destino.
+        """
         if event.is_directory:
+            EVENTS_FILTERED.inc(reason='directory')
+            return
+        
+        src = self.relative_path(event.src_path)
+        dest = self.relative_path(event.dest_path)
+        src_ignored = self.is_transient(src) or self.is_ignored_path(src)
+        dest_ignored = self.is_transient(dest) or self.is_ignored_path(dest)
+        if src_ignored and dest_ignored:
+            EVENTS_FILTERED.inc(reason='ignored')
             return
         
-        if any(x in event.src_path for x in ['.git', '.logs', '.auto-push.log']):
+        if self.aggregator.move(src, dest, src_ignored, dest_ignored):
+            if self.fingerprints is not None:
+                self.fingerprints.forget(src)
+            if dest_ignored or self.content_unchanged(FileModifiedEvent(event.dest_path)):
+                return
+            self.mark_dirty(event.dest_path)
+            self.prewrite(event.dest_path, closed=True)
+            logger.debug(f"Salvamento atômico: {event.dest_path}", extra=PATH_EVENT)
             return
         
-        self.pending_changes = True
-        logger.debug(f"Arquivo deletado: {event.src_path}")
+        if self.fingerprints is not None:
+            self.fingerprints.rename(src, dest)
+        if not src_ignored:
+            self.mark_dirty(event.src_path)
+        if not dest_ignored:
+            self.mark_dirty(event.dest_path)
+            self.prewrite(event.dest_path, closed=True)
+        logger.debug(f"Arquivo renomeado: {event.src_path} -> {event.dest_path}", extra=PATH_EVENT)
     
-    def should_push(self) -> bool:
-        """Verifica se deve fazer push"""
+    def should_push(self, batch: EventBatch, reconcile: bool = True) -> bool:
+        """Verifica se o lote retirado precisa de push.
+        
+        No caminho normal só os caminhos tocados pelos eventos são
+        consultados; um status completo roda apenas na reconciliação
+        periódica (aproveitando um push pendente), para pegar alterações
+        que o watcher não viu.
+        """
         current_time = time.time()
         
-        if not self.pending_changes:
-            return False
+        # Um único status (porcelain v2 com --branch) responde tudo
+        full_scan = batch.rescan or len(batch.paths) > self.git_manager.max_pathspec
+        reconcile = reconcile and current_time - self.last_reconcile_time >= self.reconcile_interval
+        started = time.perf_counter()
+        backend = self.git_manager.backend.name
+        if full_scan or reconcile:
+            self.last_reconcile_time = current_time
+            logger.debug("Reconciliação: status completo")
+            snapshot = self.git_manager.snapshot()
+            full_scan = True
+        else:
+            snapshot = self.index_snapshot(batch.paths)
+            if snapshot is not None:
+                backend = 'index'
+            else:
+                snapshot = self.git_manager.snapshot(batch.paths)
+        self.snapshot = snapshot
+        pipeline_log.emit(
+            'status', duration_s=round(time.perf_counter() - started, 4), full=full_scan,
+            paths=None if full_scan else len(batch.paths), entries=len(snapshot.entries),
+            branch=snapshot.branch, ahead=snapshot.ahead, behind=snapshot.behind,
+            backend=backend
+        )
         
-        if current_time - self.last_push_time < self.push_cooldown:
-            return False
+        # Após status completo (eventos perdidos ou conjunto grande demais) o
+        # stage também é completo; senão só os caminhos alterados
+        if full_scan:
+            self.stage_paths = None
+        else:
+            self.stage_paths = set()
+            for entry in snapshot.entries:
+                # Y == '.': a árvore de trabalho já bate com o índice (ex.:
+                # `git add`/`git rm` manual), não há o que adicionar
+                if entry.kind == '?' or (entry.kind != '!' and entry.xy[1] != '.'):
+                    self.stage_paths.add(entry.path)
+                    # Renomeação já no índice (git mv): a origem não casa
+                    # mais com nenhum arquivo e derrubaria o pathspec
+                    if entry.orig_path and entry.xy[0] not in 'RC':
+                        self.stage_paths.add(entry.orig_path)
+            # Subárvores de uma tempestade podem expandir em milhares de
+            # arquivos; aí o pathspec custa mais que o `add -A`
+            if len(self.stage_paths) > self.git_manager.max_pathspec:
+                self.stage_paths = None
         
-        if not self.git_manager.has_changes() and not self.git_manager.has_unpushed_commits():
-            self.pending_changes = False
-            return False
+        if self.git_manager.publish_mode == 'shadow':
+            # O snapshot segue a árvore de trabalho, não o HEAD: um arquivo que
+            # voltou ao conteúdo do HEAD some do status mas precisa entrar.
+            # Lotes sem mudança real viram árvores repetidas e são descartados
+            if not full_scan:
+                self.stage_paths = set(batch.paths)
+                if len(self.stage_paths) > self.git_manager.max_pathspec:
+                    self.stage_paths = None
+            return full_scan or bool(batch.paths) or snapshot.has_changes
         
-        return True
+        return snapshot.has_changes or snapshot.has_unpushed_commits
+    
+    def index_snapshot(self, paths: Iterable[str]) -> Optional[RepoSnapshot]:
+        """Status dos caminhos lido do .git/index, sem processo git.
+        
+        Só vale enquanto o índice é o mesmo que foi registrado como igual ao
+        HEAD (após o último commit do script ou um status completo sem
+        stage): aí "igual ao índice" significa "sem alteração". Retorna None
+        se algum caminho não pode ser decidido (conflito, submódulo,
+        diretório, índice dividido) e o status do git é usado.
+        """
+        index = self.git_manager.index
+        if index is None or not index.synced:
+            return None
+        branch = index.head_branch()
+        states = index.states(paths) if branch else None
+        if states is None:
+            INDEX_CHECKS.inc(result='fallback')
+            return None
+        
+        codes = {'modified': ('1', '.M'), 'deleted': ('1', '.D'), 'untracked': ('?', '??')}
+        entries = [StatusEntry(*codes[state], path) for path, state in sorted(states.items())
+                   if state != 'clean']
+        previous = self.snapshot
+        for state in states.values():
+            INDEX_CHECKS.inc(result=state)
+        return RepoSnapshot(
+            branch=branch, entries=entries,
+            # ahead/behind só mudam com commit, push ou fetch: vale o último status
+            upstream=previous.upstream if previous else None,
+            ahead=previous.ahead if previous and previous.branch == branch else 0,
+            behind=previous.behind if previous and previous.branch == branch else 0,
+        )
     
     def do_push(self):
         """Faz push se necessário"""
-        if not self.should_push():
+        # O lote sai inteiro do agregador; eventos que chegarem a partir
+        # daqui vão para o próximo lote
+        now = time.time()
+        batch = self.aggregator.take(now)
+        if batch is None:
             return
         
-        self.last_push_time = time.time()
-        self.pending_changes = False
+        # Arquivos ainda sendo gravados voltam para o próximo lote; se o
+        # status precisa ser completo, o lote inteiro espera por eles
+        held = self.aggregator.unstable(batch.paths, now, self.file_stat)
+        if held:
+            full_scan = batch.rescan or len(batch.paths) - len(held) > self.git_manager.max_pathspec
+            self.aggregator.restore(batch, None if full_scan else held)
+            logger.debug(f"Aguardando fim da escrita de {len(held)} arquivo(s)")
+        if not batch.pending:
+            return
+        if self.blob_writer is not None:
+            self.blob_writer.discard(batch.paths - held)
+        pipeline_log.emit(
+            'batch', events=batch.event_count, paths=len(batch.paths),
+            renames=len(batch.renames), rescan=batch.rescan, held=len(held),
+            generations=[batch.start_generation, batch.end_generation],
+            age_s=round(now - (batch.first_event_time or now), 4)
+        )
+        if not self.should_push(batch, reconcile=not held):
+            return
         
-        message = f"Auto-push: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        self.git_manager.commit_and_push(message)
+        self.aggregator.fired(time.time())
+        event_count = batch.event_count
+        first_event_time = batch.first_event_time or time.time()
+        renames = len(batch.renames)
+        logger.info(f"Rajada encerrada: {event_count} evento(s) agrupado(s)"
+                    + (f", {renames} renomeação(ões)" if renames else ""))
+        branch = self.snapshot.branch or 'main'
+        if self.push_worker is not None:
+            self.push_worker.submit(branch, event_count, first_event_time, self.stage_paths)
+        elif self.git_manager.commit_and_push(build_commit_message(event_count),
+                                              branch=branch, paths=self.stage_paths):
+            PUSH_LATENCY.observe(time.time() - first_event_time)
+
+# ============================================================================
+# Worker de push
+# ============================================================================
+
+def build_commit_message(event_count: int) -> str:
+    """Mensagem dos commits automáticos"""
+    return (
+        f"Auto-push: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        f"Eventos agrupados: {event_count}"
+    )
+
+
+class PushJob:
+    """Um commit+push pendente para uma branch"""
+    
+    def __init__(self, branch: str, event_count: int, first_event_time: float,
+                 paths: Optional[set] = None):
+        self.branch = branch
+        self.event_count = event_count
+        self.first_event_time = first_event_time  # início da rajada mais antiga
+        self.paths = paths  # caminhos a fazer stage; None = árvore inteira
+
+
+class PushWorker(threading.Thread):
+    """Executa commit e push em uma thread própria.
+    
+    Os retries de push (com backoff) não bloqueiam o agendador nem a
+    captura de eventos. Há no máximo um push em andamento e um job
+    pendente por branch: rajadas que terminam durante um push são
+    agrupadas no próximo commit.
+    """
+    
+    def __init__(self, git_manager: GitManager):
+        super().__init__(name='PushWorker', daemon=True)
+        self.git_manager = git_manager
+        self.condition = threading.Condition()
+        self.pending: Dict[str, PushJob] = {}
+        self.busy = False
+        self.stop_event = threading.Event()
+    
+    def submit(self, branch: str, event_count: int, first_event_time: float,
+               paths: Optional[set] = None):
+        """Enfileira um push, agrupando com o job pendente da mesma branch"""
+        with self.condition:
+            job = self.pending.get(branch)
+            if job is not None:
+                job.event_count += event_count
+                job.first_event_time = min(job.first_event_time, first_event_time)
+                if job.paths is None or paths is None:
+                    job.paths = None
+                else:
+                    job.paths |= paths
+                logger.info("Push em andamento: alterações agrupadas no próximo commit")
+            else:
+                self.pending[branch] = PushJob(
+                    branch, event_count, first_event_time,
+                    set(paths) if paths is not None else None
+                )
+            self.condition.notify()
+    
+    def queue_depth(self) -> int:
+        """Número de jobs aguardando o worker"""
+        with self.condition:
+            return len(self.pending)
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stop_event.is_set():
+                    self.condition.wait()
+                if self.stop_event.is_set():
+                    return
+                branch = next(iter(self.pending))
+                job = self.pending.pop(branch)
+                self.busy = True
+            
+            try:
+                if self.git_manager.commit_and_push(
+                    build_commit_message(job.event_count), self.stop_event,
+                    branch=job.branch, paths=job.paths
+                ):
+                    PUSH_LATENCY.observe(time.time() - job.first_event_time)
+            except Exception as e:
+                logger.error(f"Erro inesperado no push: {e}")
+            finally:
+                with self.condition:
+                    self.busy = False
+    
+    def stop(self):
+        """Cancela esperas de retry e encerra após o job em andamento"""
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+
+# ============================================================================
+# Escrita antecipada de blobs
+# ============================================================================
+
+class BlobWriter(threading.Thread):
+    """Grava os blobs dos arquivos alterados enquanto o debounce espera.
+
+    Assim que um arquivo fica estável (fechado após a escrita, ou sem
+    mudar de tamanho/mtime por `settle` segundos) ele é passado a um
+    `git hash-object -w --stdin-paths` persistente. No commit, o `git add`
+    encontra o objeto já gravado e pula a compressão; blobs de versões
+    que mudaram de novo ficam soltos até o próximo `git gc`.
+    """
+
+    def __init__(self, repo_path: Path, settle: float = 0.5, max_pending: int = 10000):
+        super().__init__(name='BlobWriter', daemon=True)
+        self.repo_path = repo_path
+        self.settle = settle
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.pending: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}  # caminho → (prazo, stat)
+        self.process: Optional[subprocess.Popen] = None
+        self.stop_event = threading.Event()
+
+    def file_stat(self, relative: str) -> Optional[Tuple[int, int]]:
+        """(tamanho, mtime_ns) de um arquivo regular, ou None"""
+        try:
+            st = os.lstat(os.path.join(self.repo_path, relative))
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns) if stat.S_ISREG(st.st_mode) else None
+
+    def submit(self, relative: str, closed: bool = False):
+        """Agenda o caminho; `closed` = a escrita acabou, não precisa esperar"""
+        if '\n' in relative:
+            return  # --stdin-paths é separado por linha
+        with self.condition:
+            if relative not in self.pending and len(self.pending) >= self.max_pending:
+                return
+            due = time.monotonic() + (0 if closed else self.settle)
+            self.pending[relative] = (due, None if closed else self.file_stat(relative))
+            self.condition.notify()
+
+    def discard(self, paths: Iterable[str]):
+        """Esquece caminhos que já vão para o stage (o `git add` grava o blob)"""
+        with self.condition:
+            for path in paths:
+                self.pending.pop(path, None)
+    
+    def next_ready(self) -> Optional[str]:
+        """Espera o próximo caminho vencido (com a condição adquirida)"""
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            due = min((item[0] for item in self.pending.values()), default=None)
+            if due is None:
+                self.condition.wait()
+            elif due > now:
+                self.condition.wait(due - now)
+            else:
+                relative = next(path for path, item in self.pending.items() if item[0] <= now)
+                _, expected = self.pending.pop(relative)
+                current = self.file_stat(relative)
+                if expected is not None and current != expected:
+                    # Ainda sendo gravado: espera mais um período
+                    if current is not None:
+                        self.pending[relative] = (now + self.settle, current)
+                    continue
+                if current is not None:
+                    return relative
+        return None
+
+    def hash_object(self, relative: str) -> Optional[str]:
+        """Grava o blob pelo processo persistente; None se ele falhou"""
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                ['git', 'hash-object', '-w', '--stdin-paths'], cwd=self.repo_path,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        try:
+            self.process.stdin.write(os.fsencode(relative) + b'\n')
+            self.process.stdin.flush()
+            oid = self.process.stdout.readline().strip()
+        except OSError:
+            oid = b''
+        if not oid:
+            # Arquivo sumiu entre o stat e a leitura: o processo morre com "fatal"
+            self.process.wait()
+            self.process = None
+            return None
+        return oid.decode('ascii')
+
+    def run(self):
+        while True:
+            with self.condition:
+                relative = self.next_ready()
+            if relative is None:
+                return
+            started = time.perf_counter()
+            oid = self.hash_object(relative)
+            SPECULATIVE_BLOBS.inc(result='written' if oid else 'failed')
+            if oid:
+                logger.debug(f"Blob antecipado {oid[:7]} para {relative} "
+                             f"({(time.perf_counter() - started) * 1000:.1f} ms)", extra=PATH_EVENT)
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def close(self):
+        """Encerra o processo hash-object (depois do join)"""
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+# ============================================================================
+# Observer inotify
+# ============================================================================
+
+class InotifyObserver(threading.Thread):
+    """Observer Linux que só observa diretórios relevantes.
+    
+    O Observer recursivo do watchdog instala um watch em todo diretório,
+    inclusive `.git/objects/*` e árvores ignoradas como `node_modules`.
+    Aqui o conjunto de watches cobre apenas diretórios rastreados ou não
+    ignorados, e é ajustado conforme diretórios aparecem e somem. Os eventos
+    são entregues ao handler como eventos do watchdog.
+    """
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_EXCL_UNLINK = 0x04000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+    EVENT_HEADER = struct.Struct('iIII')
+    
+    def __init__(self, handler: FileSystemEventHandler, repo_path: Path,
+                 ignore_matcher: Optional['IgnoreMatcher'] = None,
+                 tracked_dirs: Iterable[str] = ()):
+        super().__init__(name='InotifyObserver', daemon=True)
+        self.handler = handler
+        self.root = str(repo_path.resolve())
+        self.ignore_matcher = ignore_matcher
+        self.tracked_dirs = set(tracked_dirs)
+        self.watches: Dict[int, str] = {}  # wd -> caminho relativo ('' é a raiz)
+        self.paths: Dict[str, int] = {}    # caminho relativo -> wd
+        self.watch_limit_hit = False
+        
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 falhou')
+        self.wake_r, self.wake_w = os.pipe()
+        self.stopping = False
+    
+    def absolute(self, relative: str) -> str:
+        return os.path.join(self.root, relative) if relative else self.root
+    
+    def is_watchable(self, relative: str) -> bool:
+        """Diretórios fora de .git e não ignorados (ou que contêm arquivos rastreados)"""
+        if os.path.basename(relative) == '.git':
+            return False
+        if relative in self.tracked_dirs or self.ignore_matcher is None:
+            return True
+        return not self.ignore_matcher.is_ignored(relative, is_dir=True)
+    
+    def add_watch(self, relative: str) -> bool:
+        """Instala um watch em um diretório; retorna False se falhar"""
+        if relative in self.paths:
+            return True
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(self.absolute(relative)), self.WATCH_MASK
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno == 28 and not self.watch_limit_hit:  # ENOSPC
+                self.watch_limit_hit = True
+                logger.error("Limite de watches do inotify atingido "
+                             "(fs.inotify.max_user_watches); usando reconciliação")
+                self.request_rescan('limite de watches')
+            return False
+        self.watches[wd] = relative
+        self.paths[relative] = wd
+        return True
+    
+    def remove_watches(self, relative: str):
+        """Remove os watches de um diretório e de todos os seus subdiretórios"""
+        prefix = relative + '/' if relative else ''
+        for path in [p for p in self.paths if p == relative or p.startswith(prefix)]:
+            wd = self.paths.pop(path)
+            self.watches.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+    
+    def add_tree(self, relative: str, emit_files: bool = False):
+        """Observa um diretório e seus subdiretórios relevantes.
+        
+        Com `emit_files`, gera eventos de criação para arquivos que já
+        existiam (diretórios criados ou movidos para dentro da árvore).
+        """
+        stack = [relative]
+        while stack:
+            directory = stack.pop()
+            if not self.add_watch(directory):
+                continue
+            try:
+                entries = list(os.scandir(self.absolute(directory)))
+            except OSError:
+                continue
+            for entry in entries:
+                child = f"{directory}/{entry.name}" if directory else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if self.is_watchable(child):
+                        stack.append(child)
+                elif emit_files:
+                    self.handler.dispatch(FileCreatedEvent(self.absolute(child)))
+    
+    def setup(self):
+        """Instala os watches iniciais e informa quantos e quanto tempo levou"""
+        started = time.perf_counter()
+        self.add_tree('')
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"✓ Observando {len(self.paths)} diretório(s) via inotify "
+                    f"(configurado em {elapsed:.0f} ms)")
+    
+    def rescan(self, relative: str):
+        """Reavalia os watches abaixo de um diretório após mudar um .gitignore"""
+        prefix = relative + '/' if relative else ''
+        for path in [p for p in self.paths if p.startswith(prefix) and p != relative]:
+            if path in self.paths and not self.is_watchable(path):
+                self.remove_watches(path)
+        self.add_tree(relative, emit_files=False)
+    
+    def request_rescan(self, reason: str):
+        """Avisa o handler que eventos podem ter sido perdidos"""
+        request = getattr(self.handler, 'request_rescan', None)
+        if request is not None:
+            request(reason)
+    
+    def read_events(self) -> List[Tuple[int, int, int, str]]:
+        """Lê e decodifica os eventos pendentes no descritor do inotify"""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+    
+    def process(self, events: List[Tuple[int, int, int, str]]):
+        """Converte eventos do inotify em eventos do watchdog"""
+        # Pares IN_MOVED_FROM/IN_MOVED_TO chegam com o mesmo cookie
+        moved_to = {cookie: i for i, (_, mask, cookie, _) in enumerate(events)
+                    if mask & self.IN_MOVED_TO}
+        consumed = set()
+        
+        for index, (wd, mask, cookie, name) in enumerate(events):
+            if index in consumed:
+                continue
+            if mask & self.IN_Q_OVERFLOW:
+                logger.warning("Fila do inotify estourou; eventos foram perdidos")
+                self.request_rescan('fila do inotify estourou')
+                continue
+            if mask & self.IN_IGNORED:
+                relative = self.watches.pop(wd, None)
+                if relative is not None:
+                    self.paths.pop(relative, None)
+                continue
+            
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            relative = f"{directory}/{name}" if directory else name
+            path = self.absolute(relative)
+            is_dir = bool(mask & self.IN_ISDIR)
+            
+            if mask & self.IN_MOVED_FROM:
+                target = moved_to.get(cookie)
+                if target is not None:
+                    consumed.add(target)
+                    dest_wd, _, _, dest_name = events[target]
+                    dest_dir = self.watches.get(dest_wd, '')
+                    dest = f"{dest_dir}/{dest_name}" if dest_dir else dest_name
+                    if is_dir:
+                        self.remove_watches(relative)
+                        if self.is_watchable(dest):
+                            self.add_tree(dest)
+                        self.handler.dispatch(DirMovedEvent(path, self.absolute(dest)))
+                        self.request_rescan('diretório movido')
+                    else:
+                        self.handler.dispatch(FileMovedEvent(path, self.absolute(dest)))
+                elif is_dir:
+                    # Movido para fora da árvore: os arquivos somem sem eventos
+                    self.remove_watches(relative)
+                    self.handler.dispatch(DirDeletedEvent(path))
+                    self.request_rescan('diretório movido para fora')
+                else:
+                    self.handler.dispatch(FileDeletedEvent(path))
+            elif mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                if is_dir:
+                    self.handler.dispatch(DirCreatedEvent(path))
+                    if self.is_watchable(relative):
+                        self.add_tree(relative, emit_files=True)
+                else:
+                    self.handler.dispatch(FileCreatedEvent(path))
+            elif mask & self.IN_DELETE:
+                self.handler.dispatch(DirDeletedEvent(path) if is_dir else FileDeletedEvent(path))
+            elif mask & self.IN_MODIFY:
+                self.handler.dispatch(FileModifiedEvent(path))
+            elif mask & self.IN_CLOSE_WRITE:
+                self.handler.dispatch(FileClosedEvent(path))
+            
+            if name == '.gitignore' and not is_dir:
+                self.rescan(directory)
+    
+    def run(self):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        poller.register(self.wake_r, select.POLLIN)
+        while not self.stopping:
+            for fd, _ in poller.poll():
+                if fd == self.fd:
+                    try:
+                        self.process(self.read_events())
+                    except Exception as e:
+                        logger.error(f"Erro ao processar eventos do inotify: {e}")
+        os.close(self.fd)
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+    
+    def stop(self):
+        self.stopping = True
+        os.write(self.wake_w, b'\0')
+
+
+def create_observer(handler: FileSystemEventHandler, git_manager: 'GitManager',
+                    ignore_matcher: Optional['IgnoreMatcher'], preference: str = 'auto'):
+    """Cria o observer escolhido; fora do Linux usa o Observer do watchdog"""
+    if preference in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            observer = InotifyObserver(
+                handler, git_manager.repo_path, ignore_matcher,
+                git_manager.get_tracked_dirs()
+            )
+            observer.setup()
+            handler.close_events = True
+            return observer
+        except Exception as e:
+            logger.warning(f"inotify indisponível ({e}), usando Observer do watchdog")
+    elif preference == 'inotify':
+        logger.warning("inotify só está disponível no Linux, usando Observer do watchdog")
+    
+    started = time.perf_counter()
+    observer = Observer()
+    observer.schedule(handler, path=str(git_manager.repo_path), recursive=True)
+    # O backend inotify do watchdog entrega IN_CLOSE_WRITE como FileClosedEvent
+    handler.close_events = Observer.__name__ == 'InotifyObserver'
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"✓ Observando a árvore inteira via watchdog (configurado em {elapsed:.0f} ms)")
+    return observer
+
+# ============================================================================
+# Agendador
+# ============================================================================
+
+class PushScheduler:
+    """Executa os pushes sem polling.
+    
+    A thread dorme na condição do handler até chegar um evento ou vencer o
+    prazo do próximo push; sem alterações pendentes não há nenhum despertar.
+    """
+    
+    def __init__(self, handler: RepositoryChangeHandler):
+        self.handler = handler
+        self.condition = handler.condition
+        self.stopping = False
+        self.stop_reason = None
+    
+    def stop(self, reason: Optional[str] = None):
+        """Pede o encerramento do laço principal (seguro em handlers de sinal)"""
+        with self.condition:
+            self.stopping = True
+            self.stop_reason = reason
+            self.condition.notify_all()
+    
+    def wait_for_deadline(self) -> bool:
+        """Bloqueia até o prazo do próximo push; retorna False ao encerrar"""
+        with self.condition:
+            while not self.stopping:
+                deadline = self.handler.next_deadline()
+                if deadline is None:
+                    self.condition.wait()
+                    continue
+                
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return True
+                self.condition.wait(remaining)
+            return False
+    
+    def run(self):
+        """Laço principal: espera o prazo e faz o push"""
+        while self.wait_for_deadline():
+            self.handler.do_push()
 
 # ============================================================================
 # Main
@@ -288,58 +3474,325 @@ def print_banner():
     print("  Script de Auto-Push para GitHub - Academia Santiago")
     print("="*60 + "\n")
 
-def print_status(git_manager: GitManager):
+def print_status(snapshot: RepoSnapshot):
     """Exibe status do repositório"""
     print("\n" + "-"*60)
     print("Status do Repositório")
     print("-"*60)
     
-    branch = git_manager.get_current_branch()
-    print(f"Branch: {branch}")
+    print(f"Branch: {snapshot.branch or 'main'}")
     
-    status = git_manager.get_status()
-    if status:
+    entries = [entry for entry in snapshot.entries if entry.kind != '!']
+    if entries:
         print("\nArquivos modificados:")
-        for line in status.split('\n'):
-            print(f"  {line}")
+        for entry in entries:
+            path = f"{entry.orig_path} -> {entry.path}" if entry.orig_path else entry.path
+            print(f"  {entry.xy.replace('.', ' ')} {path}")
     else:
         print("Sem alterações")
     
     print("-"*60 + "\n")
 
+
+class StartupReport:
+    """Tempo de cada fase da inicialização (--startup-report)"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append((name, time.perf_counter() - started))
+    
+    def timed(self, name: str, function, *args):
+        """Envolve `function` para rodar medida em outra thread"""
+        def run():
+            with self.phase(name):
+                return function(*args)
+        return run
+    
+    def print(self):
+        total = time.perf_counter() - self.started
+        print("-"*60)
+        print("Inicialização")
+        print("-"*60)
+        for name, elapsed in self.phases:
+            print(f"  {name:<24} {elapsed * 1000:8.1f} ms")
+        print(f"  {'total (relógio)':<24} {total * 1000:8.1f} ms")
+        print("-"*60 + "\n")
+
+def env_float(name: str, default: float) -> float:
+    """Lê um número da variável de ambiente `name`, com valor padrão"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Valor inválido em {name}: {value!r}, usando {default}")
+        return default
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Lê as opções de linha de comando (variáveis de ambiente como padrão)"""
+    parser = argparse.ArgumentParser(
+        description='Monitora o repositório e faz push automático para o GitHub'
+    )
+    parser.add_argument(
+        '--quiet-period', type=float,
+        default=env_float('AUTO_PUSH_QUIET_PERIOD', 2.0),
+        help='segundos sem eventos que encerram uma rajada (padrão: 2)'
+    )
+    parser.add_argument(
+        '--max-wait', type=float,
+        default=env_float('AUTO_PUSH_MAX_WAIT', 30.0),
+        help='espera máxima desde o primeiro evento da rajada (padrão: 30)'
+    )
+    parser.add_argument(
+        '--min-interval', type=float,
+        default=env_float('AUTO_PUSH_MIN_INTERVAL', 10.0),
+        help='intervalo mínimo entre dois pushes (padrão: 10)'
+    )
+    parser.add_argument(
+        '--watcher', choices=['auto', 'inotify', 'watchdog'],
+        default=os.environ.get('AUTO_PUSH_WATCHER', 'auto'),
+        help='mecanismo de observação de arquivos (padrão: auto)'
+    )
+    parser.add_argument(
+        '--metrics-port', type=int,
+        default=int(env_float('AUTO_PUSH_METRICS_PORT', 0)),
+        help='porta do endpoint Prometheus/OpenMetrics em /metrics (padrão: desativado)'
+    )
+    parser.add_argument(
+        '--metrics-host', default=os.environ.get('AUTO_PUSH_METRICS_HOST', '127.0.0.1'),
+        help='endereço do endpoint de métricas (padrão: 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--storm-threshold', type=int,
+        default=int(env_float('AUTO_PUSH_STORM_THRESHOLD', 1000)),
+        help='eventos por segundo que ativam o modo tempestade; 0 desativa (padrão: 1000)'
+    )
+    parser.add_argument(
+        '--transient-pattern', type=transient_pattern, action='append',
+        default=[transient_pattern(value) for value in
+                 os.environ.get('AUTO_PUSH_TRANSIENT_PATTERNS', '').split()],
+        metavar='[NOME=]REGEX',
+        help='padrão extra de arquivo transitório, aplicado ao nome do arquivo (repetível)'
+    )
+    parser.add_argument(
+        '--no-default-transients', action='store_true',
+        default=bool(os.environ.get('AUTO_PUSH_NO_DEFAULT_TRANSIENTS')),
+        help='não usa os padrões embutidos (swap do vim, *~, .#lock, ___jb_tmp___, ...)'
+    )
+    parser.add_argument(
+        '--json-log', type=Path, default=os.environ.get('AUTO_PUSH_JSON_LOG') or None,
+        help='arquivo JSON lines com um registro por etapa do pipeline (padrão: desativado)'
+    )
+    parser.add_argument(
+        '--log-max-bytes', type=int,
+        default=int(env_float('AUTO_PUSH_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        help='tamanho que faz o log rotacionar (padrão: 10 MiB)'
+    )
+    parser.add_argument(
+        '--log-backups', type=int,
+        default=int(env_float('AUTO_PUSH_LOG_BACKUPS', 5)),
+        help='arquivos de log rotacionados (.gz) mantidos (padrão: 5)'
+    )
+    parser.add_argument(
+        '--log-rotate-interval', type=float,
+        default=env_float('AUTO_PUSH_LOG_ROTATE_INTERVAL', 86400.0),
+        help='segundos entre rotações por tempo; 0 desativa (padrão: 86400)'
+    )
+    parser.add_argument(
+        '--remote-check-ttl', type=float,
+        default=env_float('AUTO_PUSH_REMOTE_CHECK_TTL', 3600.0),
+        help='segundos em que uma verificação do remoto bem-sucedida vale; 0 desativa o cache (padrão: 3600)'
+    )
+    parser.add_argument(
+        '--startup-report', action='store_true',
+        default=bool(os.environ.get('AUTO_PUSH_STARTUP_REPORT')),
+        help='mostra o tempo de cada fase da inicialização'
+    )
+    parser.add_argument(
+        '--publish-mode', choices=['branch', 'shadow'],
+        default=os.environ.get('AUTO_PUSH_PUBLISH_MODE', 'branch'),
+        help='branch: commits na própria branch; shadow: snapshots em refs/autopush/<branch>, '
+             'sem tocar HEAD nem o histórico da branch (padrão: branch)'
+    )
+    parser.add_argument(
+        '--commit-engine', choices=['porcelain', 'plumbing'],
+        default=os.environ.get('AUTO_PUSH_COMMIT_ENGINE', 'porcelain'),
+        help='porcelain: git add + git commit no índice do repositório; plumbing: índice '
+             'privado + commit-tree + update-ref, sem tocar no stage do desenvolvedor '
+             '(padrão: porcelain)'
+    )
+    parser.add_argument(
+        '--no-speculative-blobs', action='store_true',
+        default=bool(os.environ.get('AUTO_PUSH_NO_SPECULATIVE_BLOBS')),
+        help='não grava os blobs dos arquivos alterados durante o debounce'
+    )
+    parser.add_argument(
+        '--no-index-reader', action='store_true',
+        default=bool(os.environ.get('AUTO_PUSH_NO_INDEX_READER')),
+        help='sempre usa o git status para confirmar as alterações (sem ler o .git/index)'
+    )
+    parser.add_argument(
+        '--fsmonitor', action='store_true',
+        default=bool(os.environ.get('AUTO_PUSH_FSMONITOR')),
+        help='serve de core.fsmonitor para o status/add/commit do próprio script '
+             '(só Unix; compensa em árvores grandes)'
+    )
+    parser.add_argument(
+        '--backend', choices=['auto', *BACKENDS],
+        default=os.environ.get('AUTO_PUSH_GIT_BACKEND', 'auto'),
+        help='backend Git usado nas verificações (padrão: auto)'
+    )
+    return parser.parse_args(argv)
+
 def main():
     """Função principal"""
+    args = parse_args()
+    queue_handler = setup_logging(args.log_max_bytes, args.log_backups, args.log_rotate_interval)
+    LOG_DROPPED.set_function(lambda: queue_handler.dropped)
+    if args.json_log:
+        pipeline_log.open(args.json_log)
     print_banner()
+    report = StartupReport()
     
-    git_manager = GitManager()
+    with report.phase('backend'):
+        git_manager = GitManager(backend=args.backend)
+    git_manager.remote_check_ttl = args.remote_check_ttl
+    git_manager.commit_engine = args.commit_engine
+    git_manager.publish_mode = args.publish_mode
     
-    # Verificações iniciais
-    if not git_manager.check_config():
-        sys.exit(1)
+    # Verificações iniciais: a configuração é uma única chamada; o remoto
+    # (rede) e o status rodam em paralelo com a preparação do observer
+    with report.phase('config'):
+        if not git_manager.check_config():
+            sys.exit(1)
+    if not args.no_index_reader:
+        git_manager.index = IndexReader(
+            git_manager.repo_path, git_manager.get_git_dir(),
+            git_manager.load_config().get('extensions.objectformat', 'sha1')
+        )
+    
+    preflight = ThreadPoolExecutor(max_workers=2, thread_name_prefix='preflight')
+    remote_check = preflight.submit(report.timed('remote', git_manager.check_remote))
+    initial_status = preflight.submit(report.timed('status', git_manager.snapshot))
+    preflight.shutdown(wait=False)
+    
+    debouncer = Debouncer(args.quiet_period, args.max_wait, args.min_interval)
+    always_ignored = [
+        os.path.relpath(log_dir, git_manager.repo_path).replace(os.sep, '/'),
+        '.auto-push.log',
+    ]
+    if args.json_log:
+        # Um log JSON dentro da árvore geraria um evento (e um commit) por flush
+        json_log = os.path.relpath(args.json_log.resolve(), git_manager.repo_path.resolve())
+        if json_log != os.pardir and not json_log.startswith(os.pardir + os.sep):
+            json_log = json_log.replace(os.sep, '/')
+            always_ignored.append(json_log)
+            if git_manager.run_git_command('check-ignore', '-q', '--', json_log)[0] != 0:
+                logger.warning(f"{json_log} não está no .gitignore: entra nos commits de reconciliação")
+    with report.phase('ignore'):
+        ignore_matcher = IgnoreMatcher(
+            git_manager.repo_path.resolve(),
+            git_manager.get_git_dir(),
+            git_manager.get_global_excludes_file(),
+            always_ignored=always_ignored
+        )
+    push_worker = PushWorker(git_manager)
+    fingerprints = FingerprintCache(git_manager.repo_path)
+    transient_patterns = {} if args.no_default_transients else dict(DEFAULT_TRANSIENT_PATTERNS)
+    transient_patterns.update(args.transient_pattern)
+    event_handler = RepositoryChangeHandler(
+        git_manager, debouncer, ignore_matcher, push_worker, fingerprints,
+        TransientClassifier(transient_patterns)
+    )
+    event_handler.storm_threshold = args.storm_threshold
+    blob_writer = None
+    if not args.no_speculative_blobs:
+        blob_writer = event_handler.blob_writer = BlobWriter(git_manager.repo_path)
+    QUEUE_DEPTH.set_function(push_worker.queue_depth)
+    DIRTY_PATHS.set_function(event_handler.aggregator.dirty_count)
+    
+    metrics_server = None
+    if args.metrics_port:
+        try:
+            metrics_server = start_metrics_server(args.metrics_host, args.metrics_port)
+        except OSError as e:
+            logger.error(f"Não foi possível iniciar o endpoint de métricas: {e}")
+    scheduler = PushScheduler(event_handler)
     
-    if not git_manager.check_remote():
+    def handle_signal(signum, frame):
+        scheduler.stop(signal.Signals(signum).name)
+    
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+    
+    with report.phase('observer'):
+        observer = create_observer(event_handler, git_manager, ignore_matcher, args.watcher)
+    
+    with report.phase('aguardando verificações'):
+        remote_ok = remote_check.result()
+        snapshot = initial_status.result()
+    if not remote_ok:
         sys.exit(1)
     
-    print_status(git_manager)
+    print_status(snapshot)
+    if args.startup_report:
+        report.print()
     
-    # Configurar observer
     logger.info("Iniciando monitoramento de alterações...")
     logger.info("Pressione Ctrl+C para parar\n")
-    
-    event_handler = RepositoryChangeHandler(git_manager)
-    observer = Observer()
-    observer.schedule(event_handler, path=str(git_manager.repo_path), recursive=True)
+    push_worker.start()
+    if blob_writer is not None:
+        blob_writer.start()
     observer.start()
     
-    try:
-        while True:
-            time.sleep(1)
-            event_handler.do_push()
-    except KeyboardInterrupt:
+    fsmonitor_server = None
+    if args.fsmonitor:
+        if hasattr(socket, 'AF_UNIX'):
+            # Só depois do observer: antes disso o diário não vê todos os eventos
+            event_handler.fsmonitor = FsmonitorJournal()
+            try:
+                fsmonitor_server = start_fsmonitor_server(git_manager.get_git_dir(),
+                                                          event_handler.fsmonitor)
+                git_manager.enable_fsmonitor(fsmonitor_hook_command(git_manager.get_git_dir()))
+            except OSError as e:
+                event_handler.fsmonitor = None
+                logger.error(f"Não foi possível iniciar o provedor core.fsmonitor: {e}")
+        else:
+            logger.warning("--fsmonitor exige sockets Unix; ignorado")
+    
+    scheduler.run()
+    
+    if scheduler.stop_reason == 'SIGINT':
         logger.info("\nScript interrompido pelo usuário")
-        observer.stop()
+    else:
+        logger.info(f"\nEncerrando ({scheduler.stop_reason})")
     
+    observer.stop()
+    push_worker.stop()
+    if blob_writer is not None:
+        blob_writer.stop()
     observer.join()
+    push_worker.join()
+    if blob_writer is not None:
+        blob_writer.join()
+        blob_writer.close()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    if fsmonitor_server is not None:
+        fsmonitor_server.shutdown()
+        Path(fsmonitor_server.server_address).unlink(missing_ok=True)
+    git_manager.backend.close()
     logger.info("Script finalizado")
 
 if __name__ == '__main__':